@@ -3,7 +3,6 @@ import random
 import math
 import warnings
 from sys import maxsize
-import json
 
 
 """
@@ -16,10 +15,13 @@ Advanced strategy tips:
 
   - The GameState.map object can be manually manipulated to create hypothetical 
   board states. Though, we recommended making a copy of the map to preserve 
-  the actual current map state.
+  the actual current map state. GameState.fork() makes a cheap copy to change.
 """
 
 class AlgoStrategy(gamelib.AlgoCore):
+    # The only parts of each action frame on_action_frame reads
+    action_frame_fields = ("events.breach", "p1Units", "p1Stats")
+
     def __init__(self):
         super().__init__()
         seed = random.randrange(maxsize)
@@ -50,6 +52,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.did_not_hurt=False
         self.destructor_locations=[]
         self.cores=45
+        self.game_state=None
 
     def on_turn(self, turn_state):
         """
@@ -59,7 +62,12 @@ class AlgoStrategy(gamelib.AlgoCore):
         unit deployments, and transmitting your intended deployments to the
         game engine.
         """
-        game_state = gamelib.GameState(self.config, turn_state)
+        # Update last turn's state in place so the map and path caches carry over
+        if self.game_state is None:
+            self.game_state = gamelib.GameState(self.config, turn_state)
+        else:
+            self.game_state.next_turn(turn_state)
+        game_state = self.game_state
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
 
@@ -76,8 +84,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         else:
             self.attack=False
 
-        state = json.loads(turn_state)
-        enemy_health = state["p2Stats"]
+        enemy_health = turn_state.state["p2Stats"]
         if enemy_health[0]==self.last_enemy_health:
             self.did_not_hurt=True
         else:
@@ -153,8 +160,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.transition=False
 
         if self.attack:
-            while game_state.can_spawn(PING, rush_location):
-                game_state.attempt_spawn(PING, rush_location)
+            # Spawns as many pings as we can afford in one call
+            game_state.attempt_spawn(PING, rush_location, 1000)
 
     def build_reactive_defense(self, game_state):
         """
@@ -310,21 +317,30 @@ class AlgoStrategy(gamelib.AlgoCore):
         estimate the path's damage risk.
         """
         damages = []
+        # Find every path in one search per target edge rather than one search per location
+        paths = game_state.find_paths_from_all_edges(start_locations=location_options)
+        # Damage enemy destructors deal each frame at every location
+        damage_map = game_state.damage_map(0)
         # Get the damage estimate each path will take
         for location in location_options:
-            path = game_state.find_path_to_edge(location)
+            path = paths[tuple(location)]
             damage = 0
-            for path_location in path:
-                # Get number of enemy destructors that can attack the final location and multiply by destructor damage
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(DESTRUCTOR, game_state.config).damage
+            for x, y in path:
+                damage += damage_map[x, y]
             damages.append(damage)
 
         # Now just return the location that takes the least damage
         return location_options[damages.index(min(damages))]
 
     def detect_enemy_unit(self, game_state, unit_type=None, valid_x = None, valid_y = None):
+        # Only visit the locations that hold enemy units of the types we are counting
+        unit_types = [unit_type] if unit_type is not None else [FILTER, ENCRYPTOR, DESTRUCTOR, PING, EMP, SCRAMBLER]
+        locations = set()
+        for counted_type in unit_types:
+            locations.update(game_state.game_map.occupancy.unit_locations(1, counted_type))
+
         total_units = 0
-        for location in game_state.game_map:
+        for location in locations:
             if game_state.contains_stationary_unit(location):
                 for unit in game_state.game_map[location]:
                     if unit.player_index == 1 and (unit_type is None or unit.unit_type == unit_type) and (valid_x is None or location[0] in valid_x) and (valid_y is None or location[1] in valid_y):
@@ -345,12 +361,11 @@ class AlgoStrategy(gamelib.AlgoCore):
         Processing the action frames is complicated so we only suggest it if you have time and experience.
         Full doc on format of a game frame at: https://docs.c1games.com/json-docs.html
         """
+        # turn_string is a FrameView holding the fields listed in action_frame_fields
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
-        events = state["events"]
-        breaches = events["breach"]
-        self.destructor_locations=state["p1Units"][2]
-        self.cores=state["p1Stats"][1]
+        breaches = turn_string["events.breach"]
+        self.destructor_locations=turn_string["p1Units"][2]
+        self.cores=turn_string["p1Stats"][1]
 
 
         for breach in breaches:
@@ -7,6 +7,11 @@ from .util import debug_write
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
+from .simulator import Simulator
+from .batch_simulator import BatchSimulator
+from .bit_schedule import BitSchedule
+from .rollout import RolloutEvaluator
+from .transposition import TranspositionTable
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["algocore", "batch_simulator", "bit_schedule", "game_state", "game_map", "navigation", "rollout", "simulator", "targeting", "think_ahead", "transposition", "unit", "util"]
  
\ No newline at end of file
@@ -1,17 +1,29 @@
 import json
 
+from .bit_schedule import get_bit_schedule
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .think_ahead import ThinkAheadWorker
+from .util import get_command, debug_write, BANNER_TEXT, send_command, StateString, FrameView, get_turn_type
 
 class AlgoCore(object):
     """This class handles communication with the game itself. Your strategy should subclass it.
 
     Attributes:
         * config (JSON): json object containing information about the game
+        * action_frame_fields (tuple): The action frame fields on_action_frame reads, as dotted paths such as
+          "events.breach". If set, on_action_frame gets a FrameView that decodes only those fields, and
+          an empty tuple skips action frames entirely. If None, on_action_frame gets the whole frame.
+        * think_ahead_fields (tuple): The action frame fields think_ahead_key reads. When plan_ahead is overridden
+          they are decoded along with action_frame_fields, so the key does not parse every frame in full.
+          If action_frame_fields is None the key reads the whole frame, which on_action_frame already gets.
 
     """
+    action_frame_fields = None
+    think_ahead_fields = ("p1Units", "p2Units")
+
     def __init__(self):
         self.config = None
+        self._think_ahead = None
 
     def on_game_start(self, config):
         """
@@ -23,7 +35,8 @@ class AlgoCore(object):
     def on_turn(self, game_state):
         """
         This step function is called every turn and is passed a string containing
-        the current game state, which can be used to initialize a new GameMap
+        the current game state, which can be used to initialize a new GameMap.
+        The string is a StateString, so game_state.state holds the parsed JSON without parsing it again.
         """
         self.submit_default_turn()
     
@@ -31,11 +44,53 @@ class AlgoCore(object):
         """
         This function is called every action frame and is passed a string containing
         the current game state, which can also be used to initialize a new GameMap.
+        Read turn_string.state for the parsed JSON rather than calling json.loads again.
         Be careful about going over your compute time as this is potentially called hundreds of 
-        times per turn
+        times per turn. Set action_frame_fields to get only the fields you need.
+        Frames are skipped entirely if this method is not overridden.
         """
         pass
 
+    def plan_ahead(self, frame):
+        """
+        Override this to plan the next turn while the action phase plays out. It runs on a background
+        thread with the newest action frame, as on_action_frame would get it plus the think_ahead_fields, and is called again only
+        when think_ahead_key of the frames changes. Whatever it returns can be collected in on_turn
+        with planned_ahead. It runs alongside on_action_frame, so avoid changing state they share.
+        Path queries and simulate are not thread-safe across forks sharing caches, so give plan_ahead
+        GameStates made with fork(share_caches=False) rather than forks on_action_frame also uses.
+        """
+        return None
+
+    def think_ahead_key(self, state):
+        """
+        Summarizes everything plan_ahead depends on, for an action frame or a turn state.
+        A plan is only handed to on_turn if the key of the turn matches the key of the frame it was made from.
+        By default this is the set of firewalls on the board. Override think_ahead_fields along with this
+        to list the frame fields it reads.
+        """
+        if isinstance(state, FrameView):
+            units = [state[field] if field in state else state.raw.state[field] for field in ("p1Units", "p2Units")]
+        else:
+            units = [state.state["p1Units"], state.state["p2Units"]]
+        return frozenset((player_index, unit_type, unit[0], unit[1])
+                         for player_index, player_units in enumerate(units)
+                         for unit_type in range(3)
+                         for unit in player_units[unit_type])
+
+    def planned_ahead(self, turn_state, timeout=0):
+        """
+        Gets the result of plan_ahead for this turn, or None if nothing was planned for this board.
+
+        Args:
+            * turn_state: The string passed to on_turn
+            * timeout: Seconds to wait if planning for this board is still running
+
+        """
+        if self._think_ahead is None:
+            return None
+        return self._think_ahead.take(turn_state, timeout)
+
     def submit_default_turn(self):
         send_command("")
         send_command("")
@@ -48,6 +103,17 @@ class AlgoCore(object):
         """
         debug_write(BANNER_TEXT)
 
+        frame_fields = self.action_frame_fields
+        if type(self).on_action_frame is AlgoCore.on_action_frame:
+            frame_fields = ()
+        frame_handled = frame_fields != ()
+        if type(self).plan_ahead is not AlgoCore.plan_ahead:
+            self._think_ahead = ThinkAheadWorker(self.plan_ahead, self.think_ahead_key)
+            self._think_ahead.start()
+            # Decodes the fields the key reads with the others, rather than parsing the whole frame for the key
+            if frame_fields is not None:
+                frame_fields = tuple(frame_fields) + tuple(field for field in self.think_ahead_fields if field not in frame_fields)
+
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
@@ -57,10 +123,13 @@ class AlgoCore(object):
                 This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                 """
                 parsed_config = json.loads(game_state_string)
+                # Tabulate the bit schedule before the first turn needs it
+                get_bit_schedule(parsed_config)
                 self.on_game_start(parsed_config)
             elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
+                # Handlers get the message as a StateString, which is only parsed if they read its state
+                game_state_string = StateString(game_state_string)
+                stateType = get_turn_type(game_state_string)
                 if stateType == 0:
                     """
                     This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
@@ -71,12 +140,20 @@ class AlgoCore(object):
                     """
                     If stateType == 1, this game_state_string string represents a single frame of an action phase
                     """
-                    self.on_action_frame(game_state_string)
+                    frame = game_state_string
+                    if frame_fields:
+                        frame = FrameView(game_state_string, frame_fields)
+                    if frame_handled:
+                        self.on_action_frame(frame)
+                    if self._think_ahead is not None:
+                        self._think_ahead.submit(frame)
                 elif stateType == 2:
                     """
                     This is the end game message. This means the game is over so break and finish the program.
                     """
                     debug_write("Got end state quitting bot.")
+                    if self._think_ahead is not None:
+                        self._think_ahead.stop()
                     break
                 else:
                     """
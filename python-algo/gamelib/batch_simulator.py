@@ -0,0 +1,279 @@
+import numpy as np
+
+from .game_map import ARENA_SIZE
+from .targeting import range_table, choose_targets, REACH
+from .unit import GameUnit
+
+
+class BatchSimulationResult:
+    """The outcomes of a batch of simulated action phases, one row per candidate deployment
+
+    Attributes:
+        * frames (numpy.ndarray): The number of frames each candidate played, shape (N,)
+        * breaches (numpy.ndarray): The number of breaches scored by each player, shape (N, 2)
+        * damage_to_player (numpy.ndarray): The health lost by each player, shape (N, 2)
+        * cores_destroyed (numpy.ndarray): The cost of the firewalls each player lost, shape (N, 2)
+        * self_destructs (numpy.ndarray): The number of information units that self destructed, shape (N,)
+
+    """
+    def __init__(self, batch_size):
+        self.frames = np.zeros(batch_size, dtype=int)
+        self.breaches = np.zeros((batch_size, 2), dtype=int)
+        self.damage_to_player = np.zeros((batch_size, 2))
+        self.cores_destroyed = np.zeros((batch_size, 2))
+        self.self_destructs = np.zeros(batch_size, dtype=int)
+
+
+class BatchSimulator:
+    """Plays out the action phase for many candidate deployments at once with NumPy arrays.
+
+    Every unit is a column of arrays shaped (N, U), where N is the number of candidates and U the
+    number of units: the firewalls of the GameState first, then the information units of the
+    largest deployment. Columns a candidate does not use start out dead. Frames follow the same order as
+    Simulator, but each step is resolved for every unit and candidate at once, which differs from
+    Simulator in a few places:
+        * Attacks within a frame are simultaneous, so targets are chosen on the stability
+          units had at the start of the attack step.
+        * Paths are found once on the starting board and are not rerouted when firewalls fall.
+        * Targets tied on every get_target rule are broken by location, then by the order units were added.
+
+    """
+    def __init__(self, game_state, deployments, enemy_deploys=None):
+        """Builds the unit arrays
+
+        Args:
+            * game_state: The GameState holding the board to simulate on
+            * deployments: A list of N candidate deployments, each a list of (unit_type, x, y) for you
+            * enemy_deploys: A list of (unit_type, x, y) the enemy is expected to deploy in every candidate
+
+        """
+        from .game_state import ENCRYPTOR, DESTRUCTOR, SCRAMBLER, UNIT_TYPE_TO_INDEX
+
+        self.config = game_state.config
+        self.mechanics = self.config["mechanics"]
+        enemy_deploys = list(enemy_deploys or [])
+        batch_size = len(deployments)
+        self.batch_size = batch_size
+
+        unit_types = [unit_information["shorthand"] for unit_information in self.config["unitInformation"][:6]]
+        templates = [GameUnit(unit_type, self.config) for unit_type in unit_types]
+        self.__build_range_tables(templates)
+
+        firewalls = []
+        for location in game_state.game_map:
+            for unit in game_state.game_map[location]:
+                if unit.stationary:
+                    firewalls.append(unit)
+        firewall_count = len(firewalls)
+        mover_count = max([len(deploys) for deploys in deployments] + [0]) + len(enemy_deploys)
+        self.firewall_count = firewall_count
+        unit_count = firewall_count + mover_count
+        shape = (batch_size, unit_count)
+
+        self.exists = np.zeros(shape, dtype=bool)
+        self.type = np.zeros(shape, dtype=int)
+        self.owner = np.zeros(shape, dtype=int)
+        self.x = np.zeros(shape, dtype=int)
+        self.y = np.zeros(shape, dtype=int)
+        self.stability = np.zeros(shape)
+        for column, unit in enumerate(firewalls):
+            self.exists[:, column] = True
+            self.type[:, column] = UNIT_TYPE_TO_INDEX[unit.unit_type]
+            self.owner[:, column] = unit.player_index
+            self.x[:, column] = unit.x
+            self.y[:, column] = unit.y
+            self.stability[:, column] = unit.stability
+
+        # Paths are shared by every mover with the same spawn location
+        paths = {}
+        self.path_id = np.zeros((batch_size, mover_count), dtype=int)
+        self.target_edge = np.zeros((batch_size, mover_count), dtype=int)
+        for row, deploys in enumerate(deployments):
+            movers = [(unit_type, x, y, 0) for unit_type, x, y in deploys] + [(unit_type, x, y, 1) for unit_type, x, y in enemy_deploys]
+            for mover, (unit_type, x, y, player_index) in enumerate(movers):
+                column = firewall_count + mover
+                if (x, y) not in paths:
+                    edge = game_state.get_target_edge([x, y])
+                    path = game_state.find_path_to_edge([x, y], edge) or [[x, y]]
+                    paths[(x, y)] = (len(paths), edge, path)
+                path_id, edge, _ = paths[(x, y)]
+                self.path_id[row, mover] = path_id
+                self.target_edge[row, mover] = edge
+                self.exists[row, column] = True
+                self.type[row, column] = UNIT_TYPE_TO_INDEX[unit_type]
+                self.owner[row, column] = player_index
+                self.x[row, column] = x
+                self.y[row, column] = y
+                self.stability[row, column] = templates[UNIT_TYPE_TO_INDEX[unit_type]].max_stability
+
+        longest = max([len(path) for _, _, path in paths.values()] + [1])
+        self.path_xy = np.zeros((len(paths) or 1, longest, 2), dtype=int)
+        self.path_length = np.ones(len(paths) or 1, dtype=int)
+        for path_id, _, path in paths.values():
+            self.path_xy[path_id, :len(path)] = path
+            self.path_length[path_id] = len(path)
+
+        self.edge_table = np.zeros((4, ARENA_SIZE, ARENA_SIZE), dtype=bool)
+        for edge, locations in enumerate(game_state.game_map.get_edges()):
+            for x, y in locations:
+                self.edge_table[edge, x, y] = True
+
+        # Per type constants, looked up by the type array
+        self.type_stationary = np.array([unit.stationary for unit in templates])
+        self.type_max_stability = np.array([unit.max_stability for unit in templates])
+        self.type_cost = np.array([unit.cost for unit in templates], dtype=float)
+        self.type_range = np.array([unit.range for unit in templates], dtype=float)
+        self.type_interval = np.array([max(1, round(1 / unit.speed)) if unit.speed else 0 for unit in templates])
+        self.type_tower_damage = np.array([unit.damage if unit.unit_type == DESTRUCTOR else 0 for unit in templates], dtype=float)
+        self.type_damage_f = np.array([getattr(unit, "damage_f", 0) for unit in templates], dtype=float)
+        self.type_damage_i = np.array([getattr(unit, "damage_i", 0) for unit in templates], dtype=float)
+        self.type_player_damage = np.array([self.config["unitInformation"][index].get(
+            "damageToPlayer", self.mechanics.get("basePlayerHealthDamage", 1)) for index in range(len(templates))], dtype=float)
+        self.type_ignores_firewalls = np.array([unit_type == SCRAMBLER or unit_type == DESTRUCTOR for unit_type in unit_types])
+
+        self.alive = self.exists.copy()
+        self.stationary = self.type_stationary[self.type]
+        destructors = np.flatnonzero(self.type[0, :firewall_count] == UNIT_TYPE_TO_INDEX[DESTRUCTOR]) if batch_size else np.zeros(0, dtype=int)
+        self.attack_columns = np.concatenate([destructors, np.arange(firewall_count, unit_count)])
+        self.encryptors = np.flatnonzero(self.type[0, :firewall_count] == UNIT_TYPE_TO_INDEX[ENCRYPTOR]) if batch_size else np.zeros(0, dtype=int)
+        self.shield_amount = np.array([firewalls[column].damage for column in self.encryptors], dtype=float)
+        self.shielded = np.zeros((batch_size, len(self.encryptors), mover_count), dtype=bool)
+        self.path_index = np.zeros((batch_size, mover_count), dtype=int)
+        self.frames_waited = np.zeros((batch_size, mover_count), dtype=int)
+        self.steps = np.zeros((batch_size, mover_count), dtype=int)
+
+    def __build_range_tables(self, templates):
+        """Builds a lookup of the offsets get_locations_in_range covers, per unit type and for self destructs
+
+        The tables span every offset between two arena locations, so any dx, dy can index them directly.
+        """
+        radii = [unit.range for unit in templates] + [self.mechanics.get("selfDestructRadius", 0)]
+        self.range_table = range_table(radii)
+        self.self_destruct_table = len(radii) - 1
+
+    def __in_range(self, table_index, dx, dy):
+        """Whether each offset is covered by get_locations_in_range for the given table
+        """
+        return self.range_table[table_index, dx + REACH, dy + REACH]
+
+    def run(self, max_frames=1000):
+        """Plays frames until no candidate has information units left
+
+        Args:
+            * max_frames: The most frames to play before giving up
+
+        Returns:
+            A BatchSimulationResult with one row per candidate deployment
+
+        """
+        result = BatchSimulationResult(self.batch_size)
+        frame = 0
+        while frame < max_frames:
+            running = self.alive[:, self.firewall_count:].any(axis=1)
+            if not running.any():
+                break
+            frame += 1
+            result.frames[running] = frame
+            self.__shield()
+            self.__move(result)
+            self.__attack()
+            self.__remove_destroyed(result)
+        return result
+
+    def __shield(self):
+        first = self.firewall_count
+        stability = self.stability[:, first:]
+        max_stability = self.type_max_stability[self.type[:, first:]]
+        decay = self.mechanics.get("shieldDecayPerFrame", 0)
+        decaying = self.alive[:, first:] & (stability > max_stability)
+        stability[decaying] = np.maximum(max_stability, stability - decay)[decaying]
+        if not len(self.encryptors):
+            return
+
+        columns = self.encryptors
+        dx = self.x[:, first:][:, None, :] - self.x[:, columns][:, :, None]
+        dy = self.y[:, first:][:, None, :] - self.y[:, columns][:, :, None]
+        in_range = np.sqrt(dx ** 2 + dy ** 2) < self.type_range[self.type[:, columns]][:, :, None] + 0.51
+        same_owner = self.owner[:, columns][:, :, None] == self.owner[:, first:][:, None, :]
+        new = (in_range & same_owner & ~self.shielded
+               & self.alive[:, columns][:, :, None] & self.alive[:, first:][:, None, :])
+        self.shielded |= new
+        stability += (new * self.shield_amount[None, :, None]).sum(axis=1)
+
+    def __move(self, result):
+        first = self.firewall_count
+        alive = self.alive[:, first:]
+        self.frames_waited += alive
+        due = alive & (self.frames_waited >= self.type_interval[self.type[:, first:]])
+        self.frames_waited[due] = 0
+
+        at_end = due & (self.path_index + 1 >= self.path_length[self.path_id])
+        stepping = due & ~at_end
+        self.path_index += stepping
+        self.steps += stepping
+        x = self.path_xy[self.path_id, self.path_index, 0]
+        y = self.path_xy[self.path_id, self.path_index, 1]
+        self.x[:, first:] = np.where(stepping, x, self.x[:, first:])
+        self.y[:, first:] = np.where(stepping, y, self.y[:, first:])
+
+        breach = stepping & self.edge_table[self.target_edge, self.x[:, first:], self.y[:, first:]]
+        damage = breach * self.type_player_damage[self.type[:, first:]]
+        owner = self.owner[:, first:]
+        for player_index in range(2):
+            scored = owner == player_index
+            result.breaches[:, player_index] += (breach & scored).sum(axis=1)
+            result.damage_to_player[:, 1 - player_index] += (damage * scored).sum(axis=1)
+        alive &= ~breach
+
+        result.self_destructs += at_end.sum(axis=1)
+        alive &= ~at_end
+        exploding = at_end & (self.steps >= self.mechanics.get("stepsRequiredSelfDestruct", 0))
+        if exploding.any():
+            dx = self.x[:, None, :] - self.x[:, first:][:, :, None]
+            dy = self.y[:, None, :] - self.y[:, first:][:, :, None]
+            hit = (self.__in_range(self.self_destruct_table, dx, dy) & exploding[:, :, None]
+                   & self.alive[:, None, :] & (self.owner[:, None, :] != owner[:, :, None]))
+            blast = self.type_max_stability[self.type[:, first:]]
+            self.stability -= (hit * blast[:, :, None]).sum(axis=1)
+
+    def __attack(self):
+        # Only destructors and information units attack, so only their columns are checked
+        columns = self.attack_columns
+        attacking = self.alive[:, columns] & (self.stability[:, columns] > 0)
+        attacker_type = self.type[:, columns]
+        dx = self.x[:, None, :] - self.x[:, columns][:, :, None]
+        dy = self.y[:, None, :] - self.y[:, columns][:, :, None]
+        candidates = (attacking[:, :, None] & self.alive[:, None, :]
+                      & (self.owner[:, columns][:, :, None] != self.owner[:, None, :])
+                      & ~(self.type_ignores_firewalls[attacker_type][:, :, None] & self.stationary[:, None, :])
+                      & self.__in_range(attacker_type[:, :, None], dx, dy))
+        rows, attackers, targets = np.nonzero(candidates)
+        if not len(rows):
+            return
+
+        # Keep the best target of every attacker by the get_target rules
+        x = self.x[rows, targets]
+        y = self.y[rows, targets]
+        chosen = choose_targets(
+            rows * len(columns) + attackers,
+            self.owner[rows, columns[attackers]],
+            dx[rows, attackers, targets] ** 2 + dy[rows, attackers, targets] ** 2,
+            self.stationary[rows, targets],
+            self.stability[rows, targets],
+            x, y,
+            (x * ARENA_SIZE + y) * self.stability.shape[1] + targets,
+        )
+        rows, attackers, targets = rows[chosen], attackers[chosen], targets[chosen]
+
+        attacker_type = attacker_type[rows, attackers]
+        damage = np.where(self.stationary[rows, columns[attackers]], self.type_tower_damage[attacker_type],
+                          np.where(self.stationary[rows, targets], self.type_damage_f[attacker_type], self.type_damage_i[attacker_type]))
+        np.subtract.at(self.stability, (rows, targets), damage)
+
+    def __remove_destroyed(self, result):
+        destroyed = self.alive & (self.stability <= 0)
+        first = self.firewall_count
+        lost = destroyed[:, :first] * self.type_cost[self.type[:, :first]]
+        for player_index in range(2):
+            result.cores_destroyed[:, player_index] += (lost * (self.owner[:, :first] == player_index)).sum(axis=1)
+        self.alive &= ~destroyed
@@ -0,0 +1,127 @@
+import numpy as np
+
+from .util import ConfigCache
+
+# How close bits * 10 must come to a half way point for project_many to redo the rounding with Python's round
+HALF_WAY_TOLERANCE = 1e-6
+
+
+class BitSchedule:
+    """The bit income and decay of a game, tabulated per turn from the resources block of the config.
+
+    Projections repeat the engine's arithmetic step by step, rounding to one decimal place every turn,
+    so they match GameState.project_future_bits to the last bit. Projections already made are
+    remembered, so asking again for the same bits, turn and horizon is a dict lookup.
+
+    Attributes:
+        * decay_factor (float): The share of a player's bits kept from one turn to the next
+        * trajectory_limit (int): The most projections remembered before the cache is cleared
+
+    """
+    def __init__(self, config, trajectory_limit=4096):
+        """Reads the bit schedule from the config
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * trajectory_limit: The most projections to remember
+
+        """
+        resources = config["resources"]
+        self.decay_factor = 1 - resources["bitDecayPerRound"]
+        self.trajectory_limit = trajectory_limit
+        self.__bits_per_round = resources["bitsPerRound"]
+        self.__growth_rate = resources["bitGrowthRate"]
+        self.__interval = resources["turnIntervalForBitSchedule"]
+        self.__income = []
+        self.__trajectories = {}
+        self.__extend_income(200)
+
+    def __extend_income(self, turns):
+        for turn in range(len(self.__income), turns):
+            self.__income.append(self.__bits_per_round + (self.__growth_rate * (turn // self.__interval)))
+
+    def income(self, turn_number):
+        """Gets the bits every player gains at the start of a turn
+
+        Args:
+            * turn_number: The turn
+
+        Returns:
+            The bits gained on that turn, before rounding
+
+        """
+        self.__extend_income(turn_number + 1)
+        return self.__income[turn_number]
+
+    def project(self, bits, turn_number, turns_in_future=1):
+        """Predicts the bits a player will have after some turns
+
+        Args:
+            * bits: The bits the player holds on turn_number
+            * turn_number: The current turn
+            * turns_in_future: The number of turns to look ahead
+
+        Returns:
+            The bits after turns_in_future turns, or bits unchanged if turns_in_future is below 1
+
+        """
+        if turns_in_future < 1:
+            return bits
+        key = (bits, turn_number)
+        trajectory = self.__trajectories.get(key)
+        if trajectory is None:
+            if len(self.__trajectories) >= self.trajectory_limit:
+                self.__trajectories.clear()
+            trajectory = []
+            self.__trajectories[key] = trajectory
+        if len(trajectory) < turns_in_future:
+            self.__extend_income(turn_number + turns_in_future + 1)
+            current = trajectory[-1] if trajectory else bits
+            for increment in range(len(trajectory) + 1, turns_in_future + 1):
+                current *= self.decay_factor
+                current += self.__income[turn_number + increment]
+                current = round(current, 1)
+                trajectory.append(current)
+        return trajectory[turns_in_future - 1]
+
+    def project_many(self, bits, turn_number, turns_in_future=1):
+        """Predicts the bits after some turns for many starting values at once
+
+        Args:
+            * bits: An array or list of the bits held on turn_number
+            * turn_number: The current turn
+            * turns_in_future: The number of turns to look ahead
+
+        Returns:
+            A numpy array with the projection of every starting value, equal to project for each
+
+        """
+        shape = np.shape(bits)
+        current = np.array(bits, dtype=float).reshape(-1)
+        self.__extend_income(turn_number + turns_in_future + 1)
+        for increment in range(1, turns_in_future + 1):
+            current = current * self.decay_factor
+            current = current + self.__income[turn_number + increment]
+            rounded = np.round(current, 1)
+            # numpy rounds bits * 10, which can fall on the wrong side of a half way point that round() gets right
+            scaled = current * 10
+            for index in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < HALF_WAY_TOLERANCE):
+                rounded[index] = round(float(current[index]), 1)
+            current = rounded
+        return current.reshape(shape)
+
+
+_schedules = ConfigCache(BitSchedule)
+
+
+def get_bit_schedule(config):
+    """Gets the BitSchedule for a config, building it the first time a config with its content is asked for
+
+    Args:
+        * config (JSON): A json object containing information about the game
+
+    Returns:
+        The BitSchedule shared by everything using an equal config
+
+    """
+    return _schedules.get(config)
@@ -1,7 +1,119 @@
+import copy
 import math
+import random
+import numpy as np
 from .unit import GameUnit
+from .occupancy import OccupancyGrid, UNIT_TYPE_COUNT
 from .util import debug_write
 
+ARENA_SIZE = 28
+HALF_ARENA = 14
+
+
+def _build_arena_tables():
+    """Computes the diamond shaped arena geometry once, at import time
+
+    Returns:
+        A tuple (in_arena, arena_cells, cell_neighbors) where locations are flat indices x * ARENA_SIZE + y:
+            * in_arena: For every flat index, True if the location is on the board
+            * arena_cells: The flat index of every location on the board, in GameMap iteration order
+            * cell_neighbors: For every flat index, the in bounds locations above, below, right and left of it, in that order
+
+    """
+    in_arena = [False] * (ARENA_SIZE * ARENA_SIZE)
+    arena_cells = []
+    for y in range(ARENA_SIZE):
+        row_size = y + 1 if y < HALF_ARENA else ARENA_SIZE - y
+        startx = HALF_ARENA - row_size
+        for x in range(startx, startx + 2 * row_size):
+            in_arena[x * ARENA_SIZE + y] = True
+            arena_cells.append(x * ARENA_SIZE + y)
+
+    cell_neighbors = []
+    for index in range(ARENA_SIZE * ARENA_SIZE):
+        x, y = divmod(index, ARENA_SIZE)
+        adjacent = []
+        for nx, ny in [[x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]]:
+            if 0 <= nx < ARENA_SIZE and 0 <= ny < ARENA_SIZE and in_arena[nx * ARENA_SIZE + ny]:
+                adjacent.append(nx * ARENA_SIZE + ny)
+        cell_neighbors.append(tuple(adjacent))
+    return tuple(in_arena), tuple(arena_cells), tuple(cell_neighbors)
+
+
+IN_ARENA, ARENA_CELLS, CELL_NEIGHBORS = _build_arena_tables()
+IN_ARENA_MASK = np.array(IN_ARENA).reshape(ARENA_SIZE, ARENA_SIZE)
+
+# The (x, y) locations of each edge, indexed like GameMap.TOP_RIGHT, TOP_LEFT, BOTTOM_LEFT and BOTTOM_RIGHT
+EDGES = (
+    tuple((HALF_ARENA + num, ARENA_SIZE - 1 - num) for num in range(HALF_ARENA)),
+    tuple((HALF_ARENA - 1 - num, ARENA_SIZE - 1 - num) for num in range(HALF_ARENA)),
+    tuple((HALF_ARENA - 1 - num, num) for num in range(HALF_ARENA)),
+    tuple((HALF_ARENA + num, num) for num in range(HALF_ARENA)),
+)
+EDGE_SETS = tuple(frozenset(edge) for edge in EDGES)
+
+# One random 64 bit key per location, unit type and owner. Seeded so hashes match between runs.
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_KEYS = [_zobrist_random.getrandbits(64) for _ in range(ARENA_SIZE * ARENA_SIZE * UNIT_TYPE_COUNT * 2)]
+ZOBRIST_MASK = (1 << 64) - 1
+
+_range_offsets = {}
+
+
+def range_offsets(radius):
+    """Gets the offsets from a location to the locations in range of it
+
+    Args:
+        * radius: The radius of the search area, as passed to GameMap.get_locations_in_range
+
+    Returns:
+        A tuple of (dx, dy) offsets, in the order get_locations_in_range returns locations.
+        Computed once per radius.
+
+    """
+    if radius not in _range_offsets:
+        # Matches the square get_locations_in_range searches, which is one short on the high side for fractional radii
+        low, high = -math.ceil(radius), math.floor(radius)
+        offsets = []
+        for dx in range(low, high + 1):
+            for dy in range(low, high + 1):
+                if math.sqrt(dx ** 2 + dy ** 2) < radius + 0.51:
+                    offsets.append((dx, dy))
+        _range_offsets[radius] = tuple(offsets)
+    return _range_offsets[radius]
+
+
+_range_stencils = {}
+
+
+def range_stencil(x, y, radius):
+    """Gets the locations on the board in range of a location
+
+    Args:
+        * x, y: The integer coordinates of the center of the search area
+        * radius: The radius of the search area
+
+    Returns:
+        A tuple of (x, y) tuples, in the order get_locations_in_range returns locations.
+        Cached per center and radius for centers inside the 28 by 28 square.
+
+    """
+    in_square = 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE
+    if in_square:
+        stencil = _range_stencils.get((x * ARENA_SIZE + y, radius))
+        if stencil is not None:
+            return stencil
+    stencil = []
+    for dx, dy in range_offsets(radius):
+        i, j = x + dx, y + dy
+        if 0 <= i < ARENA_SIZE and 0 <= j < ARENA_SIZE and IN_ARENA[i * ARENA_SIZE + j]:
+            stencil.append((i, j))
+    stencil = tuple(stencil)
+    if in_square:
+        _range_stencils[(x * ARENA_SIZE + y, radius)] = stencil
+    return stencil
+
+
 class GameMap:
     """Holds data about the current game map and provides functions
     useful for getting information related to the map.
@@ -9,6 +121,13 @@ class GameMap:
     game_map[x, y] will return a list of Units located at that location, 
     or an empty list if there are no units at the location
 
+    Use add_unit and remove_unit to change the map. The wall mask and the other
+    indexes kept by the map are not updated if the returned lists are modified directly.
+
+    Maps made with fork share their locations with the map they came from until one of them
+    changes a location, which then gets its own copy of the location's units. Keep references
+    to units only as long as the map is unchanged, and look them up again through game_map[x, y] after.
+
     Attributes:
         * config (JSON): Contains information about the game
         * ARENA_SIZE (int): The size of the arena.
@@ -17,6 +136,7 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * occupancy (:obj: OccupancyGrid): NumPy arrays of unit counts, stability and blocked locations, for vectorized queries
 
     """
     def __init__(self, config):
@@ -35,7 +155,92 @@ class GameMap:
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
         self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self.__position = 0
+        self.__prime_range_stencils()
+        self.__wall_mask = 0
+        self.__hash = 0
+        self.__stability_hash = 0
+        # Bit x * ARENA_SIZE + y is set while that location's list may be shared with a fork
+        self.__shared = 0
+        self.__cells_copied = 0
+        # Locations as they were before the changes made since each savepoint, see _savepoint
+        self.__journal = []
+        self.__savepoints = []
+        self.__journaled = 0
+        self.occupancy = OccupancyGrid(config, self.ARENA_SIZE)
+
+    def fork(self):
+        """Makes a map that starts out with the same units as this one and changes independently
+
+        Nothing is copied up front. Each location is copied by whichever map changes it first.
+
+        Returns:
+            The new GameMap
+
+        """
+        child = copy.copy(self)
+        child.__map = [column[:] for column in self.__map]
+        everything = (1 << (self.ARENA_SIZE * self.ARENA_SIZE)) - 1
+        self.__shared = everything
+        child.__shared = everything
+        child.__cells_copied = 0
+        child.__journal = []
+        child.__savepoints = []
+        child.__journaled = 0
+        child.occupancy = self.occupancy.fork()
+        return child
+
+    def _savepoint(self):
+        """Starts recording changes so _rollback can undo them. Savepoints can be nested.
+        """
+        self.__savepoints.append((len(self.__journal), self.__journaled))
+        self.__journaled = 0
+
+    def _rollback(self):
+        """Undoes every change made since the last savepoint and drops it
+        """
+        length, self.__journaled = self.__savepoints.pop()
+        while len(self.__journal) > length:
+            x, y, cell, shared = self.__journal.pop()
+            for unit in self.__map[x][y]:
+                self.__unindex_unit(unit)
+            self.__map[x][y] = cell
+            for unit in cell:
+                self.__index_unit(unit)
+            bit = 1 << (x * self.ARENA_SIZE + y)
+            self.__shared = (self.__shared & ~bit) | shared
+            self.__update_wall_bit(x, y)
+            self.__cells_copied += 1
+
+    def __own_cell(self, x, y):
+        """Prepares a location to be changed. Gives this map its own copy of the location if it
+        shares it with a fork, and keeps the original for _rollback if a savepoint is active.
+        """
+        bit = 1 << (x * self.ARENA_SIZE + y)
+        if self.__savepoints and not self.__journaled & bit:
+            self.__journal.append((x, y, self.__map[x][y], self.__shared & bit))
+            self.__journaled |= bit
+            self.__shared |= bit
+        if self.__shared & bit:
+            self.__map[x][y] = [copy.copy(unit) for unit in self.__map[x][y]]
+            self.__shared &= ~bit
+            self.__cells_copied += 1
+
+    def _own_all(self):
+        """Gives this map its own copy of every location it shares with a fork, so its units can be changed directly
+
+        Returns:
+            The number of times this map has copied units from a shared location. When it changes,
+            references to units taken from this map before may point at another map's units.
+
+        """
+        shared = self.__shared
+        while shared:
+            bit = shared & -shared
+            index = bit.bit_length() - 1
+            self.__own_cell(index // self.ARENA_SIZE, index % self.ARENA_SIZE)
+            shared ^= bit
+        return self.__cells_copied
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
@@ -45,26 +250,34 @@ class GameMap:
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            x, y = location
+            self.__clear_cell(x, y)
+            self.__map[x][y] = val
+            for unit in val:
+                self.__index_unit(unit)
+            self.__update_wall_bit(x, y)
             return
         self._invalid_coordinates(location)
 
     def __iter__(self):
-        self.__start = [13,0]
+        self.__position = 0
         return self
     
     def __next__(self):
-        location = self.__start
-        if location == [15,27]:
+        if self.__position == len(ARENA_CELLS):
             raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        index = ARENA_CELLS[self.__position]
+        self.__position += 1
+        return [index // ARENA_SIZE, index % ARENA_SIZE]
+
+    def __prime_range_stencils(self):
+        """Builds the range stencils of every unit's range for every location, once per process
+        """
+        for unit_info in self.config.get("unitInformation", []):
+            radius = unit_info.get("range")
+            if radius is not None and (ARENA_CELLS[0], radius) not in _range_stencils:
+                for index in ARENA_CELLS:
+                    range_stencil(index // ARENA_SIZE, index % ARENA_SIZE, radius)
 
     def __empty_grid(self):
         grid = []
@@ -74,8 +287,132 @@ class GameMap:
                 grid[x].append([])
         return grid
 
+    def __update_wall_bit(self, x, y):
+        bit = 1 << (x * self.ARENA_SIZE + y)
+        for unit in self.__map[x][y]:
+            if unit.stationary:
+                self.__wall_mask |= bit
+                return
+        self.__wall_mask &= ~bit
+
+    def __zobrist_key(self, unit):
+        if unit.player_index not in (0, 1):
+            return 0
+        type_index = self.occupancy.type_index[unit.unit_type]
+        return ZOBRIST_KEYS[((unit.x * self.ARENA_SIZE + unit.y) * UNIT_TYPE_COUNT + type_index) * 2 + unit.player_index]
+
+    def __stability_key(self, unit):
+        # Tuples of numbers hash the same in every process, so the key can be saved with a TranspositionTable
+        return hash((self.__zobrist_key(unit), unit.stability, unit.pending_removal)) & ZOBRIST_MASK
+
+    def __index_unit(self, unit):
+        self.occupancy.add(unit)
+        self.__hash = (self.__hash + self.__zobrist_key(unit)) & ZOBRIST_MASK
+        self.__stability_hash = (self.__stability_hash + self.__stability_key(unit)) & ZOBRIST_MASK
+
+    def __unindex_unit(self, unit):
+        self.occupancy.remove(unit)
+        self.__hash = (self.__hash - self.__zobrist_key(unit)) & ZOBRIST_MASK
+        self.__stability_hash = (self.__stability_hash - self.__stability_key(unit)) & ZOBRIST_MASK
+
+    def get_hash(self):
+        """Gets a 64 bit Zobrist hash of the units on the map
+
+        Returns:
+            The sum, modulo 2 ** 64, of a fixed random key for the location, type and owner of every unit.
+            Maps holding the same units have the same hash, however the units were added, and
+            stacked units each count. Stability is not part of the hash.
+
+        """
+        return self.__hash
+
+    def get_stability_hash(self):
+        """Gets a 64 bit hash of the stability of the units on the map, kept up to date like get_hash
+
+        Returns:
+            The sum, modulo 2 ** 64, of a key for the location, type, owner, stability and pending removal
+            of every unit. Each stacked unit adds its own key, so stacks of 15 + 5 and 10 + 10 differ.
+
+        """
+        return self.__stability_hash
+
+    def __clear_cell(self, x, y):
+        self.__own_cell(x, y)
+        for unit in self.__map[x][y]:
+            self.__unindex_unit(unit)
+        self.__map[x][y] = []
+        self.__wall_mask &= ~(1 << (x * self.ARENA_SIZE + y))
+        self.__shared &= ~(1 << (x * self.ARENA_SIZE + y))
+
+    def _place_unit(self, unit):
+        """Adds an existing GameUnit to the list at its location, keeping the map indexes up to date
+        """
+        x, y = unit.x, unit.y
+        self.__own_cell(x, y)
+        self.__map[x][y].append(unit)
+        self.__index_unit(unit)
+        if unit.stationary:
+            self.__wall_mask |= 1 << (x * self.ARENA_SIZE + y)
+
+    def _discard_unit(self, unit):
+        """Removes a single GameUnit from the list at its location, keeping the map indexes up to date
+        """
+        x, y = unit.x, unit.y
+        cell = self.__map[x][y]
+        index = next(i for i, other in enumerate(cell) if other is unit)
+        self.__own_cell(x, y)
+        unit = self.__map[x][y].pop(index)
+        self.__unindex_unit(unit)
+        if unit.stationary:
+            self.__update_wall_bit(x, y)
+
+    def set_stability(self, unit, stability):
+        """Changes the stability of a unit on the map, keeping the occupancy arrays up to date
+
+        Args:
+            * unit: A GameUnit on this map
+            * stability: Its new stability
+
+        """
+        x, y = unit.x, unit.y
+        index = next(i for i, other in enumerate(self.__map[x][y]) if other is unit)
+        self.__own_cell(x, y)
+        unit = self.__map[x][y][index]
+        self.occupancy.change_stability(unit, stability - unit.stability)
+        self.__stability_hash = (self.__stability_hash - self.__stability_key(unit)) & ZOBRIST_MASK
+        unit.stability = stability
+        self.__stability_hash = (self.__stability_hash + self.__stability_key(unit)) & ZOBRIST_MASK
+
+    def set_pending_removal(self, unit, pending_removal):
+        """Marks a unit on the map for removal, or clears the mark, keeping the stability hash up to date
+
+        Args:
+            * unit: A GameUnit on this map
+            * pending_removal: True if the unit will be removed at the end of the turn
+
+        """
+        if unit.pending_removal == pending_removal:
+            return
+        x, y = unit.x, unit.y
+        index = next(i for i, other in enumerate(self.__map[x][y]) if other is unit)
+        self.__own_cell(x, y)
+        unit = self.__map[x][y][index]
+        self.__stability_hash = (self.__stability_hash - self.__stability_key(unit)) & ZOBRIST_MASK
+        unit.pending_removal = pending_removal
+        self.__stability_hash = (self.__stability_hash + self.__stability_key(unit)) & ZOBRIST_MASK
+
+    def get_wall_mask(self):
+        """Gets the layout of the stationary units on the map
+
+        Returns:
+            An integer with bit x * ARENA_SIZE + y set for every location holding a stationary unit.
+            Two maps with the same walls have the same mask, so it can be used as a cache key.
+
+        """
+        return self.__wall_mask
+
     def _invalid_coordinates(self, location):
-        self.warn("{} is out of bounds.".format(str(location)))
+        self.warn("{} is out of bounds.", str(location))
 
     def in_arena_bounds(self, location):
         """Checks if the given location is inside the diamond shaped game board.
@@ -88,6 +425,13 @@ class GameMap:
         
         """
         x, y = location
+        try:
+            if 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE:
+                return IN_ARENA[x * ARENA_SIZE + y]
+            return False
+        except TypeError:
+            # Non integer coordinates are not in the precomputed table
+            pass
         half_board = self.HALF_ARENA
 
         row_size = y + 1
@@ -117,11 +461,10 @@ class GameMap:
 
         """
         if not quadrant_description in [self.TOP_LEFT, self.TOP_RIGHT, self.BOTTOM_LEFT, self.BOTTOM_RIGHT]:
-            self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
+            self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.", quadrant_description)
             return
 
-        edges = self.get_edges()
-        return edges[quadrant_description]
+        return [list(location) for location in EDGES[quadrant_description]]
 
     def get_edges(self):
         """Gets all of the edges and their edge locations
@@ -130,27 +473,7 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        return [[list(location) for location in edge] for edge in EDGES]
     
     def add_unit(self, unit_type, location, player_index=0):
         """Add a single GameUnit to the map at the given location.
@@ -165,15 +488,15 @@ class GameMap:
         """
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
+            return
         if player_index < 0 or player_index > 1:
-            self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
+            self.warn("Player index {} is invalid. Player index should be 0 or 1.", player_index)
 
         x, y = location
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
-        if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
-        else:
-            self.__map[x][y] = [new_unit]
+        if new_unit.stationary:
+            self.__clear_cell(x, y)
+        self._place_unit(new_unit)
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -186,9 +509,10 @@ class GameMap:
         """
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
+            return
         
         x, y = location
-        self.__map[x][y] = []
+        self.__clear_cell(x, y)
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -202,20 +526,78 @@ class GameMap:
 
         """
         if radius < 0 or radius > self.ARENA_SIZE:
-            self.warn("Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}".format(radius, self.ARENA_SIZE))
+            self.warn("Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}", radius, self.ARENA_SIZE)
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
 
         x, y = location
+        if x == int(x) and y == int(y):
+            return [[i, j] for i, j in range_stencil(int(x), int(y), radius)]
         locations = []
-        for i in range(int(x - radius), int(x + radius + 1)):
-            for j in range(int(y - radius), int(y + radius + 1)):
+        for i in range(max(int(x - radius), 0), min(int(x + radius + 1), ARENA_SIZE)):
+            for j in range(max(int(y - radius), 0), min(int(y + radius + 1), ARENA_SIZE)):
                 new_location = [i, j]
                 # A unit with a given range affects all locations who's centers are within that range + 0.51 so we add 0.51 here
-                if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + 0.51:
+                if IN_ARENA[i * ARENA_SIZE + j] and self.distance_between_locations(location, new_location) < radius + 0.51:
                     locations.append(new_location)
         return locations
 
+    def cells_in_range(self, location, radius):
+        """Gets locations in a circular area around a location, without copying them
+
+        Unlike get_locations_in_range this does not check its arguments.
+
+        Args:
+            * location: The center of our search area
+            * radius: The radius of our search area
+
+        Returns:
+            A tuple of (x, y) tuples, the same locations get_locations_in_range returns, in the same order.
+            The tuple is cached when location has integer coordinates.
+
+        """
+        x, y = location
+        if x == int(x) and y == int(y):
+            return range_stencil(int(x), int(y), radius)
+        return tuple((i, j) for i, j in self.get_locations_in_range(location, radius))
+
+    def get_unit_locations(self, player_index, unit_type):
+        """Gets the locations of the units of a type controlled by a player, without searching the map
+
+        Args:
+            * player_index: The index corresponding to the player controlling the units, 0 for you 1 for the enemy
+            * unit_type: The type of the units
+
+        Returns:
+            A list of [x, y] locations holding at least one such unit, in increasing x then y order
+
+        """
+        if player_index not in (0, 1):
+            self.warn("Player index {} is invalid. Player index should be 0 or 1.", player_index)
+            return []
+        return self.occupancy.locations(player_index, unit_type)
+
+    def sum_in_range(self, values, radius):
+        """Sums an array over the locations in range of every location
+
+        Args:
+            * values: An array of shape (ARENA_SIZE, ARENA_SIZE) indexed [x, y]
+            * radius: The radius of our search area
+
+        Returns:
+            A numpy array of the same shape where entry [x, y] is the sum of values over
+            get_locations_in_range([x, y], radius). Locations outside the arena are 0.
+
+        """
+        reach = math.ceil(radius)
+        padded = np.zeros((self.ARENA_SIZE + 2 * reach, self.ARENA_SIZE + 2 * reach))
+        padded[reach:reach + self.ARENA_SIZE, reach:reach + self.ARENA_SIZE] = np.where(IN_ARENA_MASK, values, 0)
+        total = np.zeros((self.ARENA_SIZE, self.ARENA_SIZE))
+        for dx, dy in range_offsets(radius):
+            total += padded[reach + dx:reach + dx + self.ARENA_SIZE, reach + dy:reach + dy + self.ARENA_SIZE]
+        total[~IN_ARENA_MASK] = 0
+        return total
+
     def distance_between_locations(self, location_1, location_2):
         """Euclidean distance
 
@@ -232,6 +614,13 @@ class GameMap:
 
         return math.sqrt((x1 - x2)**2 + (y1 - y2)**2)
 
-    def warn(self, message):
+    def warn(self, message, *args):
+        """Writes a warning to the debug output unless warnings are suppressed
+
+        Args:
+            * message: The warning, formatted with args only if it is written
+            * args: Values for the message's {} fields
+
+        """
         if(self.enable_warnings):
-            debug_write(message)
+            debug_write(message.format(*args) if args else message)
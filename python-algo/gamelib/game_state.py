@@ -1,10 +1,19 @@
+import contextlib
+import copy
 import math
 import json
+import sys
 
-from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
+import numpy as np
+
+from .bit_schedule import get_bit_schedule
+from .navigation import FlatShortestPathFinder, PathCache
+from .util import send_command, debug_write, StateString
 from .unit import GameUnit
-from .game_map import GameMap
+from .game_map import GameMap, EDGE_SETS
+from .simulator import Simulator
+from .targeting import range_table, choose_targets, REACH
+from .transposition import TranspositionTable, deployment_key
 
 def is_stationary(unit_type):
     return unit_type in FIREWALL_TYPES
@@ -34,6 +43,8 @@ class GameState:
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * path_cache (:obj: PathCache): Paths found by find_path_to_edge, keyed by start location, target edge and wall layout
+        * transposition_table (:obj: TranspositionTable): Results of simulate, keyed by board and deploys. Shared with forks unless share_caches is False.
 
     """
 
@@ -75,7 +86,15 @@ class GameState:
         self.CORES = 1
 
         self.game_map = GameMap(self.config)
-        self._shortest_path_finder = ShortestPathFinder()
+        # Both bottom edges, where information units can be deployed
+        self.__friendly_edges = EDGE_SETS[self.game_map.BOTTOM_LEFT] | EDGE_SETS[self.game_map.BOTTOM_RIGHT]
+        self.__unit_costs = {unit_type: config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]].get('cost') for unit_type in ALL_UNITS}
+        self._shortest_path_finder = FlatShortestPathFinder()
+        self.path_cache = PathCache()
+        self.transposition_table = TranspositionTable()
+        self.__damage_maps = [None, None]
+        self.__units_by_id = {}
+        self.__units_by_id_copies = 0
         self._build_stack = []
         self._deploy_stack = []
         self._player_resources = [
@@ -88,8 +107,21 @@ class GameState:
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
         state_line is the game state as a json string.
         """
-        state = json.loads(state_line)
+        state = self.__load_state(state_line)
+        self.__parse_stats(state)
+
+        p1units = state["p1Units"]
+        p2units = state["p2Units"]
+
+        self.__create_parsed_units(p1units, 0)
+        self.__create_parsed_units(p2units, 1)
+
+    def __load_state(self, state_line):
+        if isinstance(state_line, dict):
+            return state_line
+        return state_line.state if isinstance(state_line, StateString) else json.loads(state_line)
 
+    def __parse_stats(self, state):
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
 
@@ -105,12 +137,6 @@ class GameState:
             {'cores': p1_cores, 'bits': p1_bits},
             {'cores': p2_cores, 'bits': p2_bits}]
 
-        p1units = state["p1Units"]
-        p2units = state["p2Units"]
-
-        self.__create_parsed_units(p1units, 0)
-        self.__create_parsed_units(p2units, 1)
-
     def __create_parsed_units(self, units, player_number):
         """
         Helper function for __parse_state to add units to the map.
@@ -126,10 +152,177 @@ class GameState:
                 if unit_type == REMOVE:
                     # Quick fix will deploy engine fix soon
                     if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].pending_removal = True
+                        self.game_map.set_pending_removal(self.game_map[x,y][0], True)
+                else:
+                    unit_id = uinfo[3] if len(uinfo) > 3 else None
+                    unit = GameUnit(unit_type, self.config, player_number, hp, x, y, unit_id)
+                    self.game_map._place_unit(unit)
+                    if unit_id is not None:
+                        self.__units_by_id[unit_id] = unit
+
+    def apply_frame(self, frame):
+        """Updates this GameState in place to match an action frame
+
+        Units are matched to the frame by their unit_id. Units that moved or lost stability are updated,
+        new units are added and units missing from the frame, including any added by the algo, are removed.
+        Units the algo took off the map are added again if the frame still has them.
+        The map, its indexes and the path caches are kept, so this is much cheaper than a new GameState.
+
+        Args:
+            * frame: An action frame or turn state, as a string or a parsed dict
+
+        """
+        state = self.__load_state(frame)
+        self.__parse_stats(state)
+
+        # Units are changed directly below, so they must not be shared with a fork
+        copies = self.game_map._own_all()
+        if copies != self.__units_by_id_copies:
+            self.__units_by_id = {}
+            for location in self.game_map:
+                for unit in self.game_map[location]:
+                    if unit.unit_id is not None:
+                        self.__units_by_id[unit.unit_id] = unit
+            self.__units_by_id_copies = copies
+
+        typedef = self.config.get("unitInformation")
+        seen = set()
+        removals = []
+        for player_number, units in enumerate((state["p1Units"], state["p2Units"])):
+            for i, unit_types in enumerate(units):
+                unit_type = typedef[i].get("shorthand")
+                for uinfo in unit_types:
+                    sx, sy, shp = uinfo[:3]
+                    x, y = map(int, [sx, sy])
+                    hp = float(shp)
+                    if unit_type == REMOVE:
+                        removals.append([x, y])
+                        continue
+                    unit_id = uinfo[3] if len(uinfo) > 3 else None
+                    unit = self.__units_by_id.get(unit_id) if unit_id is not None else None
+                    if unit is not None and not any(other is unit for other in self.game_map[unit.x, unit.y]):
+                        # Taken off the map since it was indexed, by remove_unit or by replacing its location
+                        unit = None
+                    if unit is None or unit.unit_type != unit_type or unit.player_index != player_number:
+                        unit = GameUnit(unit_type, self.config, player_number, hp, x, y, unit_id)
+                        self.game_map._place_unit(unit)
+                        if unit_id is not None:
+                            self.__units_by_id[unit_id] = unit
+                    else:
+                        if unit.x != x or unit.y != y:
+                            self.game_map._discard_unit(unit)
+                            unit.x, unit.y = x, y
+                            self.game_map._place_unit(unit)
+                        if unit.stability != hp:
+                            self.game_map.set_stability(unit, hp)
+                    seen.add(id(unit))
+
+        for location in self.game_map:
+            for unit in list(self.game_map[location]):
+                if id(unit) not in seen:
+                    self.game_map._discard_unit(unit)
+                    if self.__units_by_id.get(unit.unit_id) is unit:
+                        del self.__units_by_id[unit.unit_id]
                 else:
-                    unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+                    self.game_map.set_pending_removal(unit, False)
+        for location in removals:
+            if self.contains_stationary_unit(location):
+                self.game_map.set_pending_removal(self.game_map[location][0], True)
+
+    def fork(self, share_caches=True):
+        """Makes a GameState to try out changes on without touching this one
+
+        The fork shares the config, path finder and path cache with this GameState and starts out
+        sharing every map location. A location is copied only when one of the two states changes it,
+        so forking is cheap even when done thousands of times per turn. Resources and the build and
+        deploy stacks are copied.
+
+        Finding paths or simulating updates the path finder and caches, so states sharing them must not
+        be used from different threads at once. Fork with share_caches=False to hand the fork to another
+        thread, and fork on the thread that owns this GameState, as forking marks its map locations shared.
+
+        Args:
+            * share_caches: False to give the fork its own path finder, path cache and transposition table
+
+        Returns:
+            The new GameState
+
+        """
+        child = self._with_map(self.game_map.fork())
+        if not share_caches:
+            child._shortest_path_finder = FlatShortestPathFinder()
+            child.path_cache = PathCache(self.path_cache.maxsize)
+            child.transposition_table = TranspositionTable(self.transposition_table.max_bytes)
+        return child
+
+    def _with_map(self, game_map):
+        """Copies this GameState onto another GameMap, leaving this GameState and its map untouched
+
+        Args:
+            * game_map: The GameMap the copy uses
+
+        Returns:
+            The new GameState, with its own resources and build and deploy stacks
+
+        """
+        child = copy.copy(self)
+        child.game_map = game_map
+        child._build_stack = list(self._build_stack)
+        child._deploy_stack = list(self._deploy_stack)
+        child._player_resources = [dict(resources) for resources in self._player_resources]
+        child.__damage_maps = list(self.__damage_maps)
+        child.__units_by_id = {}
+        # Forces the copy to index its own units before it first applies a frame
+        child.__units_by_id_copies = -1
+        return child
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Undoes every change made to this GameState inside a with block when the block exits
+
+        Spawns, removals, map changes, resources and the build and deploy stacks are restored in time
+        proportional to the number of changes. Transactions can be nested to try out changes depth first:
+
+            with game_state.transaction():
+                game_state.attempt_spawn(DESTRUCTOR, [13, 11])
+                with game_state.transaction():
+                    game_state.attempt_spawn(DESTRUCTOR, [14, 11])
+                # [14, 11] is empty again here
+            # and [13, 11] here
+
+        Locations changed inside the block hold copies of their units until it exits,
+        so look units up again through game_map[x, y] rather than keeping references.
+
+        """
+        build_length = len(self._build_stack)
+        deploy_length = len(self._deploy_stack)
+        resources = [dict(player_resources) for player_resources in self._player_resources]
+        self.game_map._savepoint()
+        try:
+            yield self
+        finally:
+            self.game_map._rollback()
+            del self._build_stack[build_length:]
+            del self._deploy_stack[deploy_length:]
+            self._player_resources = resources
+
+    def next_turn(self, state):
+        """Moves this GameState on to a new turn in place, instead of building a new GameState
+
+        The planned build and deploy stacks are cleared and the board is updated with apply_frame.
+
+        Args:
+            * state: The turn state passed to on_turn
+
+        Returns:
+            This GameState
+
+        """
+        self.serialized_string = state
+        self._build_stack = []
+        self._deploy_stack = []
+        self.apply_frame(state)
+        return self
 
     def __resource_required(self, unit_type):
         return self.CORES if is_stationary(unit_type) else self.BITS
@@ -147,10 +340,10 @@ class GameState:
         self._player_resources[player_index][resource_key] = held_resource + amount
 
     def _invalid_player_index(self, index):
-        self.warn("Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)".format(index))
+        self.warn("Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)", index)
     
     def _invalid_unit(self, unit):
-        self.warn("Invalid unit {}".format(unit))
+        self.warn("Invalid unit {}", unit)
 
     def submit_turn(self):
         """Submit and end your turn.
@@ -177,7 +370,7 @@ class GameState:
             self._invalid_player_index(player_index)
             return
         if not resource_type == self.BITS and not resource_type == self.CORES:
-            self.warn("Invalid resource_type '{}'. Please use game_state.BITS or game_state.CORES".format(resource_type))
+            self.warn("Invalid resource_type '{}'. Please use game_state.BITS or game_state.CORES", resource_type)
             return
 
         if resource_type == self.BITS:
@@ -201,10 +394,8 @@ class GameState:
             self._invalid_unit(unit_type)
             return
 
-        cost = self.type_cost(unit_type)
-        resource_type = self.__resource_required(unit_type)
-        player_held = self.get_resource(resource_type)
-        return math.floor(player_held / cost)
+        resource_key = 'cores' if is_stationary(unit_type) else 'bits'
+        return math.floor(self._player_resources[0][resource_key] / self.__unit_costs[unit_type])
 
     def project_future_bits(self, turns_in_future=1, player_index=0, current_bits=None):
         """Predicts the number of bits we will have on a future turn
@@ -220,20 +411,14 @@ class GameState:
         """
 
         if turns_in_future < 1 or turns_in_future > 99:
-            self.warn("Invalid turns in future used ({}). Turns in future should be between 1 and 99".format(turns_in_future))
+            self.warn("Invalid turns in future used ({}). Turns in future should be between 1 and 99", turns_in_future)
         if not player_index == 1 and not player_index == 0:
             self._invalid_player_index(player_index)
         if type(current_bits) == int and current_bits < 0:
-            self.warn("Invalid current bits ({}). Current bits cannot be negative.".format(current_bits))
+            self.warn("Invalid current bits ({}). Current bits cannot be negative.", current_bits)
 
         bits = self.get_resource(self.BITS, player_index) if not current_bits else current_bits
-        for increment in range(1, turns_in_future + 1):
-            current_turn = self.turn_number + increment
-            bits *= (1 - self.config["resources"]["bitDecayPerRound"])
-            bits_gained = self.config["resources"]["bitsPerRound"] + (self.config["resources"]["bitGrowthRate"] * (current_turn // self.config["resources"]["turnIntervalForBitSchedule"]))
-            bits += bits_gained
-            bits = round(bits, 1)
-        return bits
+        return get_bit_schedule(self.config).project(bits, self.turn_number, turns_in_future)
 
     def type_cost(self, unit_type):
         """Gets the cost of a unit based on its type
@@ -249,8 +434,7 @@ class GameState:
             self._invalid_unit(unit_type)
             return
 
-        unit_def = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]
-        return unit_def.get('cost')
+        return self.__unit_costs[unit_type]
 
     def can_spawn(self, unit_type, location, num=1):
         """Check if we can spawn a unit at a location. 
@@ -273,15 +457,14 @@ class GameState:
             return
         
         if not self.game_map.in_arena_bounds(location):
-            if self.enable_warnings:
-                self.warn("Could not spawn {} at location {}. Location invalid.".format(unit_type, location))
+            self.warn("Could not spawn {} at location {}. Location invalid.", unit_type, location)
             return False
 
         affordable = self.number_affordable(unit_type) >= num
         stationary = is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = (location[0], location[1]) in self.__friendly_edges
 
         if self.enable_warnings:
             fail_reason = ""
@@ -294,12 +477,51 @@ class GameState:
             if not (stationary or on_edge):
                 fail_reason = fail_reason + " Information units must be deployed on the edge."
             if len(fail_reason) > 0:
-                self.warn("Could not spawn {} at location {}.{}".format(unit_type, location, fail_reason))
+                self.warn("Could not spawn {} at location {}.{}", unit_type, location, fail_reason)
 
         return (affordable and correct_territory and not blocked and
                 (stationary or on_edge) and
                 (not stationary or num == 1))
 
+    def can_spawn_many(self, unit_type, locations, num=1):
+        """Check if we can spawn a unit at each of many locations, as can_spawn would for each on its own
+
+        Resources are only checked once, so this does not account for spending them on earlier locations.
+
+        Args:
+            * unit_type: The type of the unit
+            * locations: A list of locations we want to spawn the unit at
+            * num: The number of units we want to spawn at each location
+
+        Returns:
+            A list with True for every location where we can spawn the unit(s), in the order of locations
+
+        """
+        if unit_type not in ALL_UNITS:
+            self._invalid_unit(unit_type)
+            return
+        if self.enable_warnings:
+            # Only can_spawn explains why a location failed
+            return [self.can_spawn(unit_type, location, num) for location in locations]
+
+        stationary = is_stationary(unit_type)
+        if self.number_affordable(unit_type) < num or (stationary and num != 1):
+            return [False] * len(locations)
+
+        game_map = self.game_map
+        wall_mask = game_map.get_wall_mask()
+        mask = []
+        for location in locations:
+            if location[1] >= self.HALF_ARENA or not game_map.in_arena_bounds(location):
+                mask.append(False)
+                continue
+            x, y = map(int, location)
+            if stationary:
+                mask.append(not game_map[x, y])
+            else:
+                mask.append((x, y) in self.__friendly_edges and not wall_mask >> (x * self.ARENA_SIZE + y) & 1)
+        return mask
+
     def attempt_spawn(self, unit_type, locations, num=1):
         """Attempts to spawn new units with the type given in the given locations.
 
@@ -316,25 +538,43 @@ class GameState:
             self._invalid_unit(unit_type)
             return
         if num < 1:
-            self.warn("Attempted to spawn fewer than one units! ({})".format(num))
+            self.warn("Attempted to spawn fewer than one units! ({})", num)
             return
       
         if type(locations[0]) == int:
             locations = [locations]
+
+        stationary = is_stationary(unit_type)
+        cost = self.__unit_costs[unit_type]
+        resource_key = 'cores' if stationary else 'bits'
+        held = self._player_resources[0][resource_key]
+        stack = self._build_stack if stationary else self._deploy_stack
+        built = set()
         spawned_units = 0
-        for location in locations:
-            for i in range(num):
-                if self.can_spawn(unit_type, location, 1):
-                    x, y = map(int, location)
-                    cost = self.type_cost(unit_type)
-                    resource_type = self.__resource_required(unit_type)
-                    self.__set_resource(resource_type, 0 - cost)
-                    self.game_map.add_unit(unit_type, location, 0)
-                    if is_stationary(unit_type):
-                        self._build_stack.append((unit_type, x, y))
-                    else:
-                        self._deploy_stack.append((unit_type, x, y))
-                    spawned_units += 1
+        # Every location is checked against the board as it was before this call, so
+        # only firewalls placed by this call and spent resources need tracking below
+        for location, valid in zip(locations, self.can_spawn_many(unit_type, locations, 1)):
+            if not valid:
+                continue
+            x, y = map(int, location)
+            if stationary:
+                if (x, y) in built:
+                    self.warn("Could not spawn {} at location {}. Location is blocked.", unit_type, location)
+                    continue
+                built.add((x, y))
+            count = 0
+            # Spend the same way one spawn at a time would, so the float resources match exactly
+            while count < (1 if stationary else num) and math.floor(held / cost) >= 1:
+                held = held + (0 - cost)
+                count += 1
+            if count == 0:
+                self.warn("Could not spawn {} at location {}. Not enough resources.", unit_type, location)
+                break
+            for _ in range(count):
+                self.game_map.add_unit(unit_type, location, 0)
+            stack.extend([(unit_type, x, y)] * count)
+            spawned_units += count
+        self._player_resources[0][resource_key] = held
         return spawned_units
 
     def attempt_remove(self, locations):
@@ -356,7 +596,7 @@ class GameState:
                 self._build_stack.append((REMOVE, x, y))
                 removed_units += 1
             else:
-                self.warn("Could not remove a unit from {}. Location has no firewall or is enemy territory.".format(location))
+                self.warn("Could not remove a unit from {}. Location has no firewall or is enemy territory.", location)
         return removed_units
 
     def get_target_edge(self, start_location):
@@ -384,16 +624,70 @@ class GameState:
             A list of locations corresponding to the path the unit would take 
             to get from it's starting location to the best available end location
 
+        Paths are cached in path_cache under the start location, the target edge and the current wall layout,
+        so asking again while the stationary units are unchanged does not search the map again.
+
         """
         if self.contains_stationary_unit(start_location):
-            self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+            self.warn("Attempted to perform pathing from blocked starting location {}", start_location)
             return
 
         if target_edge is None:
             target_edge = self.get_target_edge(start_location)
 
-        end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        key = (start_location[0], start_location[1], target_edge, self.game_map.get_wall_mask())
+        path = self.path_cache.get(key)
+        if path is None:
+            end_points = self.game_map.get_edge_locations(target_edge)
+            path = self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+            if path is None:
+                return
+            path = tuple((x, y) for x, y in path)
+            self.path_cache.put(key, path)
+        return [[x, y] for x, y in path]
+
+    def find_paths_from_all_edges(self, target_edge=None, start_locations=None):
+        """Gets the paths units at many starting locations would take
+
+        Unlike calling find_path_to_edge for every location, this runs the path search
+        once per target edge and pocket of pathable space and reads every path off that shared search.
+
+        Args:
+            * target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Will auto calculate for each location if None.
+            * start_locations: The locations of the hypothetical units. Defaults to every location on your two edges.
+
+        Returns:
+            A dict mapping each start location, as an (x, y) tuple, to the path find_path_to_edge
+            would return for it. Blocked start locations are left out.
+
+        """
+        if start_locations is None:
+            start_locations = self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT)
+
+        wall_mask = self.game_map.get_wall_mask()
+        paths = {}
+        uncached = {}
+        for location in start_locations:
+            if self.contains_stationary_unit(location):
+                continue
+            edge = self.get_target_edge(location) if target_edge is None else target_edge
+            path = self.path_cache.get((location[0], location[1], edge, wall_mask))
+            if path is None:
+                uncached.setdefault(edge, []).append(location)
+            else:
+                paths[(location[0], location[1])] = path
+
+        for edge, locations in uncached.items():
+            end_points = self.game_map.get_edge_locations(edge)
+            found = self._shortest_path_finder.navigate_multiple_starts(locations, end_points, self)
+            for location, path in zip(locations, found):
+                if path is None:
+                    continue
+                path = tuple((x, y) for x, y in path)
+                self.path_cache.put((location[0], location[1], edge, wall_mask), path)
+                paths[(location[0], location[1])] = path
+
+        return {location: [[x, y] for x, y in path] for location, path in paths.items()}
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked
@@ -414,9 +708,16 @@ class GameState:
                 return unit
         return False
 
-    def warn(self, message):
+    def warn(self, message, *args):
+        """Writes a warning to the debug output unless warnings are suppressed
+
+        Args:
+            * message: The warning, formatted with args only if it is written
+            * args: Values for the message's {} fields
+
+        """
         if(self.enable_warnings):
-            debug_write(message)
+            debug_write(message.format(*args) if args else message)
 
     def suppress_warnings(self, suppress):
         """Suppress all warnings
@@ -445,11 +746,11 @@ class GameState:
         """
 
         if not isinstance(attacking_unit, GameUnit):
-            self.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.".format(type(attacking_unit)))
+            self.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.", type(attacking_unit))
             return
 
-        attacker_location = [attacking_unit.x, attacking_unit.y]
-        possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.range)
+        attacker_x, attacker_y = attacking_unit.x, attacking_unit.y
+        possible_locations = self.game_map.cells_in_range([attacker_x, attacker_y], attacking_unit.range)
         target = None
         target_stationary = True
         target_distance = sys.maxsize
@@ -467,7 +768,7 @@ class GameState:
 
                 new_target = False
                 unit_stationary = unit.stationary
-                unit_distance = self.game_map.distance_between_locations(location, [attacking_unit.x, attacking_unit.y])
+                unit_distance = math.sqrt((location[0] - attacker_x) ** 2 + (location[1] - attacker_y) ** 2)
                 unit_stability = unit.stability
                 unit_y = unit.y
                 unit_x_distance = abs(self.HALF_ARENA - 0.5 - unit.x)
@@ -511,6 +812,61 @@ class GameState:
                     target_x_distance = unit_x_distance
         return target
 
+    def get_targets(self, attacking_units):
+        """Returns the targets of many units at once, resolving every attacker together with NumPy
+
+        Each target is the unit get_target would return for the same attacker on the current map.
+
+        Args:
+            * attacking_units: A list of GameUnits
+
+        Returns:
+            A list with the GameUnit each unit would choose to attack, or None, in the order of attacking_units
+
+        """
+        targets = [None] * len(attacking_units)
+        attackers = []
+        for index, unit in enumerate(attacking_units):
+            if isinstance(unit, GameUnit):
+                attackers.append(index)
+            else:
+                self.warn("Passed a {} to get_targets as an attacking unit. Expected a GameUnit.", type(unit))
+
+        # Units in the order get_target visits them, by location and then by their place in the location's list
+        occupied = set()
+        for player_index in (0, 1):
+            for unit_type in ALL_UNITS:
+                occupied.update(self.game_map.occupancy.unit_locations(player_index, unit_type))
+        units = [unit for x, y in sorted(occupied) for unit in self.game_map[x, y]]
+        if not attackers or not units:
+            return targets
+
+        attacking = [attacking_units[index] for index in attackers]
+        radii = sorted({unit.range for unit in attacking})
+        table = range_table(radii)
+        radius_index = np.array([radii.index(unit.range) for unit in attacking])
+        attacker_x = np.array([unit.x for unit in attacking], dtype=int)
+        attacker_y = np.array([unit.y for unit in attacking], dtype=int)
+        attacker_player = np.array([unit.player_index for unit in attacking])
+        scrambler = np.array([unit.unit_type == SCRAMBLER for unit in attacking])
+        x = np.array([unit.x for unit in units], dtype=int)
+        y = np.array([unit.y for unit in units], dtype=int)
+        player = np.array([unit.player_index for unit in units])
+        stationary = np.array([unit.stationary for unit in units])
+        stability = np.array([unit.stability for unit in units], dtype=float)
+
+        dx = x[None, :] - attacker_x[:, None]
+        dy = y[None, :] - attacker_y[:, None]
+        reachable = (np.abs(dx) <= REACH) & (np.abs(dy) <= REACH)
+        in_range = reachable & table[radius_index[:, None], np.clip(dx, -REACH, REACH) + REACH, np.clip(dy, -REACH, REACH) + REACH]
+        candidates = in_range & (player[None, :] != attacker_player[:, None]) & ~(scrambler[:, None] & stationary[None, :])
+        attacker, unit = np.nonzero(candidates)
+        chosen = choose_targets(attacker, attacker_player[attacker], dx[attacker, unit] ** 2 + dy[attacker, unit] ** 2,
+                                stationary[unit], stability[unit], x[unit], y[unit], unit)
+        for pair in chosen:
+            targets[attackers[attacker[pair]]] = units[unit[pair]]
+        return targets
+
     def get_attackers(self, location, player_index):
         """Gets the destructors threatening a given location
 
@@ -526,15 +882,79 @@ class GameState:
         if not player_index == 0 and not player_index == 1:
             self._invalid_player_index(player_index)
         if not self.game_map.in_arena_bounds(location):
-            self.warn("Location {} is not in the arena bounds.".format(location))
+            self.warn("Location {} is not in the arena bounds.", location)
 
         attackers = []
         """
         Get locations in the range of DESTRUCTOR units
         """
-        possible_locations= self.game_map.get_locations_in_range(location, self.config["unitInformation"][UNIT_TYPE_TO_INDEX[DESTRUCTOR]]["range"])
-        for location in possible_locations:
-            for unit in self.game_map[location]:
-                if unit.unit_type == DESTRUCTOR and unit.player_index != player_index:
-                    attackers.append(unit)
+        destructors = [self.game_map.occupancy.unit_locations(index, DESTRUCTOR) for index in (0, 1) if index != player_index]
+        if not any(destructors):
+            return attackers
+        possible_locations = self.game_map.cells_in_range(location, self.config["unitInformation"][UNIT_TYPE_TO_INDEX[DESTRUCTOR]]["range"])
+        for x, y in possible_locations:
+            if any((x, y) in locations for locations in destructors):
+                for unit in self.game_map[x, y]:
+                    if unit.unit_type == DESTRUCTOR and unit.player_index != player_index:
+                        attackers.append(unit)
         return attackers
+
+    def board_hash(self):
+        """Gets a hash of the units on the board, for use as a memoization key
+
+        Returns:
+            A 64 bit Zobrist hash over the location, type and owner of every unit on the map, kept up to date
+            as units are added and removed. It does not cover stability, resources or the planned stacks.
+
+        """
+        return self.game_map.get_hash()
+
+    def simulate(self, enemy_deploys=None):
+        """Simulates the action phase that would follow this turn, reusing earlier results for the same board
+
+        Results are kept in transposition_table under the board hash, the stability of every unit and
+        the deploys of both players, so asking again for a board and deploys seen before is a dict lookup.
+
+        Args:
+            * enemy_deploys: A list of (unit_type, x, y) the enemy is expected to deploy
+
+        Returns:
+            The summary of a Simulator run, see SimulationResult.summary
+
+        """
+        enemy_deploys = enemy_deploys or []
+        key = (self.board_hash(), self.game_map.get_stability_hash(),
+               deployment_key(self._deploy_stack), deployment_key(enemy_deploys))
+        summary = self.transposition_table.get(key)
+        if summary is None:
+            summary = Simulator(self, enemy_deploys).run().summary()
+            self.transposition_table.put(key, summary)
+        return summary
+
+    def damage_map(self, player_index=0):
+        """Gets the damage enemy destructors would deal each frame to a unit at every location
+
+        Args:
+            * player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            A read only numpy array of shape (ARENA_SIZE, ARENA_SIZE) indexed [x, y]. Entry [x, y] equals
+            len(get_attackers([x, y], player_index)) times the destructor damage, and is 0 outside the arena.
+            The array is reused until the attacking player's destructors change.
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return
+
+        destructors = self.game_map.occupancy.counts[1 - player_index, UNIT_TYPE_TO_INDEX[DESTRUCTOR]]
+        layout = destructors.tobytes()
+        cached = self.__damage_maps[player_index]
+        if cached is not None and cached[0] == layout:
+            return cached[1]
+
+        unit_def = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[DESTRUCTOR]]
+        damage = self.game_map.sum_in_range(destructors, unit_def["range"]) * unit_def["damage"]
+        damage.flags.writeable = False
+        self.__damage_maps[player_index] = (layout, damage)
+        return damage
@@ -2,7 +2,9 @@ import heapq
 import math
 import sys
 import queue
+from collections import deque, OrderedDict
 from .util import debug_write
+from .game_map import ARENA_SIZE, CELL_NEIGHBORS
 
 class Node:
     """A pathfinding node
@@ -20,6 +22,62 @@ class Node:
         self.blocked = False
         self.pathlength = -1
 
+class PathCache:
+    """A bounded cache of paths that evicts the least recently used path when full
+
+    Attributes:
+        * maxsize (int): The number of paths the cache holds before it starts evicting
+        * hits (int): The number of lookups that found a cached path
+        * misses (int): The number of lookups that did not
+
+    """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__paths = OrderedDict()
+
+    def __len__(self):
+        return len(self.__paths)
+
+    def get(self, key):
+        """Gets a cached path
+
+        Args:
+            * key: The key the path was stored under
+
+        Returns:
+            The cached path, or None if there is no path stored under key
+
+        """
+        path = self.__paths.get(key)
+        if path is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__paths.move_to_end(key)
+        return path
+
+    def put(self, key, path):
+        """Stores a path, evicting the least recently used path if the cache is full
+
+        Args:
+            * key: The key to store the path under
+            * path: The path to store
+
+        """
+        self.__paths[key] = path
+        self.__paths.move_to_end(key)
+        if len(self.__paths) > self.maxsize:
+            self.__paths.popitem(last=False)
+
+    def clear(self):
+        """Removes every cached path and resets the hit and miss counters
+        """
+        self.__paths.clear()
+        self.hits = 0
+        self.misses = 0
+
 """
 This class helps with pathfinding. We guarantee the results will
 be accurate, but top players may want to write their own pathfinding
@@ -36,6 +94,8 @@ class ShortestPathFinder:
         * game_map (:obj: GameMap): The current gamemap
 
     """
+    _neighbor_locations = tuple(tuple([n // ARENA_SIZE, n % ARENA_SIZE] for n in neighbors) for neighbors in CELL_NEIGHBORS)
+
     def __init__(self):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
@@ -67,6 +127,8 @@ class ShortestPathFinder:
         """
         if game_state.contains_stationary_unit(start_point):
             return
+        if not game_state.game_map.in_arena_bounds(start_point):
+            return
 
         #Initialize map 
         self.initialize_map(game_state)
@@ -93,7 +155,7 @@ class ShortestPathFinder:
         while not current.empty():
             search_location = current.get()
             for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+                if self.game_map[neighbor[0]][neighbor[1]].blocked:
                     continue
 
                 x, y = neighbor
@@ -110,10 +172,10 @@ class ShortestPathFinder:
         return most_ideal
 
     def _get_neighbors(self, location):
-        """Get the locations adjacent to a location
+        """Get the in bounds locations adjacent to a location, from the precomputed arena table
         """
         x, y = location
-        return [[x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]]
+        return self._neighbor_locations[x * ARENA_SIZE + y]
 
     def _get_direction_from_endpoints(self, end_points):
         """Prints a message to the games debug output
@@ -181,7 +243,7 @@ class ShortestPathFinder:
             current_location = current.get()
             current_node = self.game_map[current_location[0]][current_location[1]]
             for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+                if self.game_map[neighbor[0]][neighbor[1]].blocked:
                     continue
 
                 neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
@@ -212,7 +274,7 @@ class ShortestPathFinder:
                 move_direction = self.VERTICAL
             else:
                 move_direction = self.HORIZONTAL
-            path.append(next_move)
+            path.append([next_move[0], next_move[1]])
             current = next_move
         
         #debug_write(path)
@@ -228,7 +290,7 @@ class ShortestPathFinder:
         best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
         for neighbor in neighbors:
             #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+            if self.game_map[neighbor[0]][neighbor[1]].blocked:
                 continue
 
             new_best = False
@@ -314,3 +376,420 @@ class ShortestPathFinder:
             sys.stderr.write(" ")
         sys.stderr.write(str(number))
         sys.stderr.write(" ")
+
+
+class FlatShortestPathFinder:
+    """Handles pathfinding using preallocated flat arrays
+
+    Returns the same paths as ShortestPathFinder, but keeps the search state of every
+    location in flat lists indexed by x * ARENA_SIZE + y.
+
+    The pathlengths found by the validation step are kept between calls, one list per set of
+    validation seeds (the target edge, or the ideal tile of a pocket that cannot reach it).
+    When the walls change by only a few locations those lists are repaired around each changed
+    location instead of being searched again, so the paths stay exact while trying placements
+    one at a time costs a fraction of a full search.
+
+    Attributes:
+        * HORIZONTAL (int): A constant representing a horizontal movement
+        * VERTICAL (int): A constant representing a vertical movement
+        * MAX_FIELDS (int): The number of pathlength lists kept between calls
+        * MAX_REPAIRS (int): Above this many changed locations the pathlength lists are searched again instead of repaired
+
+        * blocked (list): 1 if there is a firewall at the location, 0 otherwise
+        * visited_idealness (list): 1 if the location was visited during the idealness search step
+        * pathlength (list): The distance between the location and the target location in the last search, -1 if unreachable
+
+    """
+    ARENA_SIZE = 28
+    HALF_ARENA = 14
+    MAX_FIELDS = 8
+    MAX_REPAIRS = 24
+
+    def __init__(self):
+        self.HORIZONTAL = 1
+        self.VERTICAL = 2
+        self.initialized = False
+        size = self.ARENA_SIZE * self.ARENA_SIZE
+        self._zeros = [0] * size
+        self._unknown = [-1] * size
+        self.blocked = [0] * size
+        self.visited_idealness = [0] * size
+        self.pathlength = self._unknown
+        self._neighbors = CELL_NEIGHBORS
+        self._wall_mask = 0
+        self._fields = OrderedDict()
+
+    def initialize_map(self, game_state):
+        """Brings the blocked locations and the kept pathlengths up to date with the game state
+
+        Args:
+            * game_state: A GameState object representing the gamestate we want to path through
+        """
+        self.initialized = True
+        self.game_state = game_state
+        wall_mask = game_state.game_map.get_wall_mask()
+        changed = wall_mask ^ self._wall_mask
+        self._wall_mask = wall_mask
+        if not changed:
+            return
+
+        if bin(changed).count("1") > self.MAX_REPAIRS:
+            self._fields.clear()
+            self.blocked[:] = self._zeros
+            for index in self._mask_indices(wall_mask):
+                self.blocked[index] = 1
+            return
+
+        for index in self._mask_indices(changed):
+            self.blocked[index] = 1 - self.blocked[index]
+            for field, seeds in self._fields.values():
+                if self.blocked[index]:
+                    self._repair_added_wall(field, seeds, index)
+                else:
+                    self._repair_removed_wall(field, seeds, index)
+
+    def _mask_indices(self, mask):
+        """Yields the flat index of every bit set in a wall mask
+        """
+        while mask:
+            low_bit = mask & -mask
+            yield low_bit.bit_length() - 1
+            mask ^= low_bit
+
+    def navigate_multiple_endpoints(self, start_point, end_points, game_state):
+        """Finds the path a unit would take to reach a set of endpoints
+
+        Args:
+            * start_point: The starting location of the unit
+            * end_points: The end points of the unit, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            The path a unit at start_point would take when trying to reach end_points given the current game state.
+            Note that this path can change if a tower is destroyed during pathing, or if you or your enemy places firewalls.
+
+        """
+        if game_state.contains_stationary_unit(start_point):
+            return
+        if not game_state.game_map.in_arena_bounds(start_point):
+            return
+        return self.navigate_multiple_starts([start_point], end_points, game_state)[0]
+
+    def navigate_multiple_starts(self, start_points, end_points, game_state):
+        """Finds the paths units at several starting locations would take to reach the same set of endpoints
+
+        Every start that can reach the edge reads its path off the same pathlengths, and
+        the idealness search only runs once for each pocket of pathable space that cannot.
+
+        Args:
+            * start_points: The starting locations of the units
+            * end_points: The end points of the units, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            A list with the path for each start point, in the same order, as navigate_multiple_endpoints
+            would return it. The entry is None for start points that are blocked or out of bounds.
+
+        """
+        self.initialize_map(game_state)
+        targets = tuple(x * self.ARENA_SIZE + y for x, y in end_points)
+        target_set = set(targets)
+        direction = self._get_direction_from_endpoints(end_points)
+        edge_field = self._get_field(targets)
+
+        paths = [None] * len(start_points)
+        pockets = []
+        for i, start_point in enumerate(start_points):
+            if not game_state.game_map.in_arena_bounds(start_point):
+                continue
+            start = start_point[0] * self.ARENA_SIZE + start_point[1]
+            if self.blocked[start]:
+                continue
+            #A start reached from the edge is in a pocket whose ideal tile is on the edge
+            if edge_field[start] >= 0:
+                self.pathlength = edge_field
+                paths[i] = self._get_path(start_point, direction)
+            else:
+                pockets.append(i)
+        if not pockets:
+            return paths
+
+        #The rest self destruct at the ideal tile of their pocket, searched once per pocket
+        self.visited_idealness[:] = self._zeros
+        ideal_of = {}
+        for i in pockets:
+            start = start_points[i][0] * self.ARENA_SIZE + start_points[i][1]
+            if start not in ideal_of:
+                pocket = []
+                ideal_tile = self._idealness_search(start, target_set, direction, pocket)
+                for location in pocket:
+                    ideal_of[location] = ideal_tile
+            self.pathlength = self._get_field((ideal_of[start],))
+            paths[i] = self._get_path(start_points[i], direction)
+        return paths
+
+    def _idealness_search(self, start, targets, direction, pocket=None):
+        """
+        Finds the most ideal tile in our 'pocket' of pathable space.
+        The edge if it is available, or the best self destruct location otherwise.
+        If a pocket list is passed, every location searched is appended to it.
+        """
+        blocked = self.blocked
+        visited = self.visited_idealness
+        neighbors = self._neighbors
+        current = deque([start])
+        visited[start] = 1
+        best_idealness = self._get_idealness(start, targets, direction)
+        most_ideal = start
+        if pocket is not None:
+            pocket.append(start)
+
+        while current:
+            search_location = current.popleft()
+            for neighbor in neighbors[search_location]:
+                if blocked[neighbor] or visited[neighbor]:
+                    continue
+                visited[neighbor] = 1
+                current.append(neighbor)
+                if pocket is not None:
+                    pocket.append(neighbor)
+                current_idealness = self._get_idealness(neighbor, targets, direction)
+                if current_idealness > best_idealness:
+                    best_idealness = current_idealness
+                    most_ideal = neighbor
+
+        return most_ideal
+
+    def _get_direction_from_endpoints(self, end_points):
+        """Gets the direction of an edge
+
+        Args:
+            * end_points: A set of endpoints, should be an edge
+
+        Returns:
+            A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
+
+        """
+        x, y = end_points[0]
+        direction = [1, 1]
+        if x < self.HALF_ARENA:
+            direction[0] = -1
+        if y < self.HALF_ARENA:
+            direction[1] = -1
+        return direction
+
+    def _get_idealness(self, index, targets, direction):
+        """Get the idealness of a tile, see ShortestPathFinder._get_idealness
+        """
+        if index in targets:
+            return sys.maxsize
+
+        x, y = divmod(index, self.ARENA_SIZE)
+        idealness = 28 * y if direction[1] == 1 else 28 * (27 - y)
+        idealness += x if direction[0] == 1 else 27 - x
+        return idealness
+
+    def _get_field(self, seeds):
+        """Gets the pathlengths from a tuple of seed locations, searching only if they are not kept already
+        """
+        if seeds in self._fields:
+            self._fields.move_to_end(seeds)
+            return self._fields[seeds][0]
+        field = self._search_field(seeds)
+        self._fields[seeds] = (field, frozenset(seeds))
+        if len(self._fields) > self.MAX_FIELDS:
+            self._fields.popitem(last=False)
+        return field
+
+    def _search_field(self, seeds):
+        """Breadth first search of the grid from the seed locations, returning the pathlength of each location
+
+        """
+        blocked = self.blocked
+        neighbors = self._neighbors
+        pathlength = list(self._unknown)
+        current = deque()
+        for index in seeds:
+            current.append(index)
+            pathlength[index] = 0
+
+        while current:
+            current_location = current.popleft()
+            if blocked[current_location]:
+                continue
+            next_pathlength = pathlength[current_location] + 1
+            for neighbor in neighbors[current_location]:
+                if blocked[neighbor] or not pathlength[neighbor] == -1:
+                    continue
+                pathlength[neighbor] = next_pathlength
+                current.append(neighbor)
+        return pathlength
+
+    def _repair_added_wall(self, field, seeds, wall):
+        """Updates pathlengths after a wall was placed at a location
+
+        Finds the locations whose every shortest route passed through the wall, then
+        searches outward from the untouched locations around them to set their new pathlengths.
+        """
+        blocked = self.blocked
+        neighbors = self._neighbors
+        wall_pathlength = field[wall]
+        if wall not in seeds:
+            field[wall] = -1
+        if wall_pathlength == -1:
+            return
+
+        #Visit locations in order of pathlength, so every possible parent is settled before its children
+        orphans = set()
+        checked = set()
+        current = deque(n for n in neighbors[wall] if not blocked[n] and field[n] == wall_pathlength + 1 and n not in seeds)
+        while current:
+            location = current.popleft()
+            if location in checked:
+                continue
+            checked.add(location)
+            pathlength = field[location]
+            has_parent = False
+            for neighbor in neighbors[location]:
+                if field[neighbor] == pathlength - 1 and not blocked[neighbor] and neighbor not in orphans:
+                    has_parent = True
+                    break
+            if has_parent:
+                continue
+            orphans.add(location)
+            for neighbor in neighbors[location]:
+                if field[neighbor] == pathlength + 1 and not blocked[neighbor] and neighbor not in seeds:
+                    current.append(neighbor)
+
+        for location in orphans:
+            field[location] = -1
+        frontier = []
+        for location in orphans:
+            best = -1
+            for neighbor in neighbors[location]:
+                if not blocked[neighbor] and field[neighbor] >= 0 and (best == -1 or field[neighbor] + 1 < best):
+                    best = field[neighbor] + 1
+            if best >= 0:
+                heapq.heappush(frontier, (best, location))
+        while frontier:
+            pathlength, location = heapq.heappop(frontier)
+            if field[location] >= 0:
+                continue
+            field[location] = pathlength
+            for neighbor in neighbors[location]:
+                if neighbor in orphans and field[neighbor] == -1:
+                    heapq.heappush(frontier, (pathlength + 1, neighbor))
+
+    def _repair_removed_wall(self, field, seeds, wall):
+        """Updates pathlengths after the wall at a location was removed, spreading any shorter routes through it
+        """
+        blocked = self.blocked
+        neighbors = self._neighbors
+        if wall not in seeds:
+            best = -1
+            for neighbor in neighbors[wall]:
+                if not blocked[neighbor] and field[neighbor] >= 0 and (best == -1 or field[neighbor] + 1 < best):
+                    best = field[neighbor] + 1
+            field[wall] = best
+            if best == -1:
+                return
+
+        current = deque([wall])
+        while current:
+            location = current.popleft()
+            next_pathlength = field[location] + 1
+            for neighbor in neighbors[location]:
+                if blocked[neighbor]:
+                    continue
+                if field[neighbor] == -1 or field[neighbor] > next_pathlength:
+                    field[neighbor] = next_pathlength
+                    current.append(neighbor)
+
+    def _get_path(self, start_point, direction):
+        """Once all locations are validated, and a target is found, the unit can path to its target
+
+        """
+        path = [start_point]
+        current = start_point[0] * self.ARENA_SIZE + start_point[1]
+        move_direction = 0
+
+        while not self.pathlength[current] == 0:
+            next_move = self._choose_next_move(current, move_direction, direction)
+            if current // self.ARENA_SIZE == next_move // self.ARENA_SIZE:
+                move_direction = self.VERTICAL
+            else:
+                move_direction = self.HORIZONTAL
+            path.append(list(divmod(next_move, self.ARENA_SIZE)))
+            current = next_move
+
+        return path
+
+    def _choose_next_move(self, current_point, previous_move_direction, direction):
+        """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
+        """
+        blocked = self.blocked
+        pathlength = self.pathlength
+        ideal_neighbor = current_point
+        best_pathlength = pathlength[current_point]
+        for neighbor in self._neighbors[current_point]:
+            if blocked[neighbor]:
+                continue
+
+            current_pathlength = pathlength[neighbor]
+            if current_pathlength > best_pathlength:
+                continue
+            if current_pathlength == best_pathlength and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, direction):
+                continue
+
+            ideal_neighbor = neighbor
+            best_pathlength = current_pathlength
+
+        return ideal_neighbor
+
+    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, direction):
+        """Compare two tiles and return True if the unit would rather move to the new one, see ShortestPathFinder._better_direction
+
+        """
+        prev_x, prev_y = divmod(prev_tile, self.ARENA_SIZE)
+        new_x, new_y = divmod(new_tile, self.ARENA_SIZE)
+        best_x, best_y = divmod(prev_best, self.ARENA_SIZE)
+        if previous_move_direction == self.HORIZONTAL and not new_x == best_x:
+            return not prev_y == new_y
+        if previous_move_direction == self.VERTICAL and not new_y == best_y:
+            return not prev_x == new_x
+        if previous_move_direction == 0:
+            return not prev_y == new_y
+
+        #To make it here, both moves are on the same axis
+        if new_y == best_y:
+            return (direction[0] == 1 and new_x > best_x) or (direction[0] == -1 and new_x < best_x)
+        if new_x == best_x:
+            return (direction[1] == 1 and new_y > best_y) or (direction[1] == -1 and new_y < best_y)
+        return True
+
+    def print_map(self):
+        """Prints an ASCII version of the current game map for debug purposes
+
+        """
+        if not self.initialized:
+            debug_write("Attempted to print_map before pathfinder initialization. Use 'this_object.initialize_map(game_state)' to initialize the map first")
+            return
+
+        for y in range(28):
+            for x in range(28):
+                index = x * self.ARENA_SIZE + 28 - y - 1
+                if not self.blocked[index] and not self.pathlength[index] == -1:
+                    self._print_justified(self.pathlength[index])
+                else:
+                    sys.stderr.write("   ")
+            debug_write("")
+
+    def _print_justified(self, number):
+        """Prints a number between 100 and -10 in 3 spaces
+
+        """
+        if number < 10 and number > -1:
+            sys.stderr.write(" ")
+        sys.stderr.write(str(number))
+        sys.stderr.write(" ")
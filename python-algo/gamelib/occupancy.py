@@ -0,0 +1,126 @@
+import copy
+
+import numpy as np
+
+# The unit types that can stand on the map, in the order of config["unitInformation"]. The last entry, remove, never does.
+UNIT_TYPE_COUNT = 6
+
+
+class OccupancyGrid:
+    """NumPy arrays summarizing the units on a GameMap, kept up to date by the map itself.
+
+    The arrays are indexed [player_index, type_index, x, y], where type_index is the
+    position of the unit type in config["unitInformation"] (the same as GameState.UNIT_TYPE_TO_INDEX),
+    so board wide questions become array expressions instead of loops over the map. For example
+    the enemy destructor locations are numpy.argwhere(grid.counts[1, 2] > 0).
+
+    The grid also keeps, for every player and unit type, a dict from (x, y) to the number of those
+    units there, so listing or counting the units of one type costs the number of units, not the board.
+
+    Attributes:
+        * counts (numpy.ndarray): The number of units of each player and type at each location, shape (2, 6, 28, 28)
+        * stability (numpy.ndarray): The summed stability of those units, same shape as counts
+        * blocked (numpy.ndarray): True where a stationary unit stands, shape (28, 28)
+        * type_index (dict): Maps a unit type to its type_index
+
+    Stability is recorded when a unit is added to the map. Use GameMap.set_stability to change
+    the stability of a unit on the map so the arrays follow.
+
+    """
+    def __init__(self, config, arena_size=28):
+        self.type_index = {}
+        for index, unit_information in enumerate(config["unitInformation"][:UNIT_TYPE_COUNT]):
+            self.type_index[unit_information["shorthand"]] = index
+        self.counts = np.zeros((2, UNIT_TYPE_COUNT, arena_size, arena_size), dtype=np.int16)
+        self.stability = np.zeros((2, UNIT_TYPE_COUNT, arena_size, arena_size))
+        self.blocked = np.zeros((arena_size, arena_size), dtype=bool)
+        self.__unit_locations = [[{} for _ in range(UNIT_TYPE_COUNT)] for _ in range(2)]
+        self.__shared = False
+
+    def fork(self):
+        """Makes a grid for a forked map. The arrays are shared until either grid changes, which then copies them.
+        """
+        child = copy.copy(self)
+        self.__shared = True
+        child.__shared = True
+        return child
+
+    def __own(self):
+        if self.__shared:
+            self.counts = self.counts.copy()
+            self.stability = self.stability.copy()
+            self.blocked = self.blocked.copy()
+            self.__unit_locations = [[dict(locations) for locations in player] for player in self.__unit_locations]
+            self.__shared = False
+
+    def add(self, unit):
+        """Records a unit that was placed on the map
+        """
+        if unit.player_index not in (0, 1):
+            return
+        self.__own()
+        key = (unit.player_index, self.type_index[unit.unit_type], unit.x, unit.y)
+        self.counts[key] += 1
+        locations = self.__unit_locations[key[0]][key[1]]
+        locations[unit.x, unit.y] = locations.get((unit.x, unit.y), 0) + 1
+        self.stability[key] += unit.stability
+        if unit.stationary:
+            self.blocked[unit.x, unit.y] = True
+
+    def remove(self, unit):
+        """Records a unit that was taken off the map
+        """
+        if unit.player_index not in (0, 1):
+            return
+        self.__own()
+        key = (unit.player_index, self.type_index[unit.unit_type], unit.x, unit.y)
+        self.counts[key] -= 1
+        locations = self.__unit_locations[key[0]][key[1]]
+        if locations[unit.x, unit.y] == 1:
+            del locations[unit.x, unit.y]
+        else:
+            locations[unit.x, unit.y] -= 1
+        if self.counts[key] == 0:
+            # Reset rather than subtract so rounding never leaves stability on an empty location
+            self.stability[key] = 0
+        else:
+            self.stability[key] -= unit.stability
+        if unit.stationary:
+            self.blocked[unit.x, unit.y] = False
+
+    def change_stability(self, unit, amount):
+        """Records a change to the stability of a unit on the map
+        """
+        if unit.player_index not in (0, 1):
+            return
+        self.__own()
+        self.stability[unit.player_index, self.type_index[unit.unit_type], unit.x, unit.y] += amount
+
+    def count(self, player_index, unit_type):
+        """The number of units of a type a player has on the map
+        """
+        return sum(self.__unit_locations[player_index][self.type_index[unit_type]].values())
+
+    def total_stability(self, player_index, unit_type):
+        """The summed stability of every unit of a type a player has on the map
+        """
+        return float(self.stability[player_index, self.type_index[unit_type]].sum())
+
+    def locations(self, player_index, unit_type):
+        """Gets the locations holding units of a type controlled by a player
+
+        Returns:
+            A list of [x, y] locations, in increasing x then y order
+
+        """
+        return [[x, y] for x, y in sorted(self.__unit_locations[player_index][self.type_index[unit_type]])]
+
+    def unit_locations(self, player_index, unit_type):
+        """Gets the index of the units of a type controlled by a player
+
+        Returns:
+            A dict from (x, y) to the number of those units at the location. It is the grid's own
+            index, kept up to date as the map changes, so read it without changing it.
+
+        """
+        return self.__unit_locations[player_index][self.type_index[unit_type]]
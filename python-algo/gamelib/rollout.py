@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import sys
+import time
+
+from .util import debug_write
+
+# The config each worker process was started with, read by evaluate functions through worker_config
+_config = None
+
+
+def _start_worker(config):
+    global _config
+    _config = config
+    # The game reads turns from stdout, so anything a worker prints goes to the debug output instead
+    sys.stdout = sys.stderr
+
+
+def _ready():
+    return os.getpid()
+
+
+def _rollout(evaluate, plan, deadline):
+    if time.time() >= deadline:
+        return None
+    return evaluate(_config, plan, deadline)
+
+
+def worker_config():
+    """Gets the config the current worker process was started with
+    """
+    return _config
+
+
+class RolloutEvaluator:
+    """Scores candidate plans on a pool of worker processes within the turn's time limit.
+
+    The evaluate function is called in a worker as evaluate(config, plan, deadline) and returns a score,
+    higher being better, or None to drop the plan. It must be defined at module level so it can be pickled.
+    Long evaluations should check time.time() against deadline and return early once it passes.
+
+    Create the evaluator and call warm_up in on_game_start so the processes are running and
+    hold the config before the first turn.
+
+    Attributes:
+        * config (JSON): The config given to every worker
+        * workers (int): The number of worker processes
+        * time_budget (float): Seconds evaluate may spend when no deadline is given
+
+    """
+    def __init__(self, config, evaluate, workers=None, margin=0.5):
+        """Sets up the evaluator. No processes are started until warm_up or evaluate is called.
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * evaluate: The function scoring a single plan
+            * workers: The number of worker processes, every core by default
+            * margin: Seconds kept free below waitTimeBotSoft when no deadline is given
+
+        """
+        self.config = config
+        self.evaluate_plan = evaluate
+        self.workers = workers or os.cpu_count() or 1
+        soft_limit = config.get("timingAndReplay", {}).get("waitTimeBotSoft", 5000) / 1000
+        self.time_budget = max(0, soft_limit - margin)
+        self.__pool = None
+
+    def warm_up(self):
+        """Starts every worker process and waits until they are ready
+        """
+        for result in self.__start_workers():
+            result.wait()
+
+    def __start_workers(self):
+        """Starts the pool if needed and hands every worker a task, so all of them start running
+
+        Returns:
+            The AsyncResults of the tasks, ready once each worker is
+
+        """
+        if self.__pool is None:
+            self.__pool = multiprocessing.Pool(self.workers, initializer=_start_worker, initargs=(self.config,))
+        return [self.__pool.apply_async(_ready) for _ in range(self.workers)]
+
+    def __restart(self):
+        """Terminates the worker processes, stopping plans still running, and starts new ones without waiting for them
+        """
+        self.__pool.terminate()
+        self.__pool = None
+        self.__start_workers()
+
+    def evaluate(self, plans, deadline=None):
+        """Scores plans until every plan is done or the deadline passes
+
+        Args:
+            * plans: A list of picklable plans
+            * deadline: The time.time() value by which results are needed. Defaults to time_budget seconds from now.
+
+        Returns:
+            A list of (score, plan) pairs for the plans scored in time, best first.
+            If any plan is not done when the deadline passes, the worker processes are replaced
+            so the next call does not wait behind the plans left waiting or running.
+
+        """
+        if deadline is None:
+            deadline = time.time() + self.time_budget
+        if self.__pool is None:
+            self.warm_up()
+
+        pending = [self.__pool.apply_async(_rollout, (self.evaluate_plan, plan, deadline)) for plan in plans]
+        for result in pending:
+            result.wait(max(0, deadline - time.time()))
+        done = [(index, result) for index, result in enumerate(pending) if result.ready()]
+        if len(done) < len(pending):
+            self.__restart()
+
+        results = []
+        for index, result in done:
+            try:
+                score = result.get()
+            except Exception as error:
+                debug_write("Rollout of plan {} failed: {}".format(index, error))
+                continue
+            if score is not None:
+                results.append((score, index))
+        results.sort(key=lambda result: (-result[0], result[1]))
+        return [(score, plans[index]) for score, index in results]
+
+    def best(self, plans, deadline=None):
+        """Gets the best plan scored before the deadline
+
+        Returns:
+            The highest scoring plan, or None if no plan was scored in time
+
+        """
+        results = self.evaluate(plans, deadline)
+        if not results:
+            return None
+        return results[0][1]
+
+    def shutdown(self):
+        """Stops the worker processes, dropping any plans still waiting or running
+        """
+        if self.__pool is not None:
+            self.__pool.terminate()
+            self.__pool = None
@@ -0,0 +1,242 @@
+from .game_map import GameMap, EDGE_SETS
+from .unit import GameUnit
+
+
+class SimulationResult:
+    """The outcome of a simulated action phase
+
+    Attributes:
+        * frames (int): The number of frames played
+        * breaches (list): The information units that reached their target edge, at the location they scored from
+        * damage_to_player (list): The health lost by each player, [0] for you and [1] for the enemy
+        * destroyed (list): The units destroyed during the action phase, firewalls and information alike
+        * cores_destroyed (list): The cost of the firewalls each player lost, [0] for you and [1] for the enemy
+        * self_destructs (list): The information units that self destructed
+        * game_state (:obj: GameState): A private GameState holding the units left standing at the end of the action phase
+
+    """
+    def __init__(self, game_state):
+        self.frames = 0
+        self.breaches = []
+        self.damage_to_player = [0, 0]
+        self.destroyed = []
+        self.cores_destroyed = [0, 0]
+        self.self_destructs = []
+        self.game_state = game_state
+
+    def summary(self):
+        """Gets the numbers describing the action phase, without the units, so they are cheap to store
+
+        Returns:
+            A dict with frames, breaches, damage_to_player, cores_destroyed and self_destructs,
+            where breaches and self_destructs are counts
+
+        """
+        return {
+            "frames": self.frames,
+            "breaches": len(self.breaches),
+            "damage_to_player": list(self.damage_to_player),
+            "cores_destroyed": list(self.cores_destroyed),
+            "self_destructs": len(self.self_destructs),
+        }
+
+    def __str__(self):
+        return "{} frames, {} breaches, damage to players: {}, cores destroyed: {}".format(
+            self.frames, len(self.breaches), self.damage_to_player, self.cores_destroyed)
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class _Mover:
+    """Simulation bookkeeping for one information unit, kept beside the GameUnit
+    """
+    def __init__(self, unit, target_edge, edge_locations, interval):
+        self.unit = unit
+        self.target_edge = target_edge
+        self.edge_locations = edge_locations
+        self.interval = interval
+        self.frames_waited = 0
+        self.steps = 0
+        self.path = None
+        self.path_index = 0
+
+
+class Simulator:
+    """Plays out the action phase that follows the current turn, entirely inside the algo.
+
+    The simulator copies the firewalls of a GameState, including those placed with attempt_spawn,
+    into a private GameState so the original is never changed. Information units come from
+    the planned _deploy_stack for you and from an optional list of deploys for the enemy.
+
+    Each frame runs in this order:
+        1. Encryptors shield friendly information units in range, once per encryptor and unit.
+           Shields above a unit's max_stability then decay by shieldDecayPerFrame.
+        2. Information units move one step along their path every round(1 / speed) frames.
+           A unit on its target edge breaches and is removed. A unit with nowhere left to go self
+           destructs, damaging enemy units within selfDestructRadius by its max_stability if it
+           took at least stepsRequiredSelfDestruct steps.
+        3. Every unit attacks the unit get_target picks for it. Destructors only attack information units.
+        4. Units with no stability left are removed. If a firewall was destroyed and rerouteMidRound
+           is set, information units find a new path from where they stand.
+
+    Firewalls flagged for removal stay for the whole action phase, as they do in the game.
+
+    """
+    def __init__(self, game_state, enemy_deploys=None):
+        """Copies the board and the planned deploys
+
+        Args:
+            * game_state: The GameState to simulate from, after your attempt_spawn calls
+            * enemy_deploys: A list of (unit_type, x, y) the enemy is expected to deploy
+
+        """
+        from .game_state import ENCRYPTOR, DESTRUCTOR, UNIT_TYPE_TO_INDEX
+
+        self.UNIT_TYPE_TO_INDEX = UNIT_TYPE_TO_INDEX
+        self.ENCRYPTOR = ENCRYPTOR
+        self.DESTRUCTOR = DESTRUCTOR
+        self.config = game_state.config
+        self.mechanics = self.config["mechanics"]
+
+        # Not a fork, which would leave the map of game_state copying locations on every later change
+        self.game_state = game_state._with_map(GameMap(self.config))
+        self.game_state.suppress_warnings(True)
+        self.game_map = self.game_state.game_map
+
+        self.firewalls = []
+        for location in game_state.game_map:
+            for unit in game_state.game_map[location]:
+                if unit.stationary:
+                    firewall = GameUnit(unit.unit_type, self.config, unit.player_index, unit.stability, unit.x, unit.y)
+                    firewall.pending_removal = unit.pending_removal
+                    self.game_map._place_unit(firewall)
+                    self.firewalls.append(firewall)
+
+        self.movers = []
+        for unit_type, x, y in self.game_state._deploy_stack:
+            self.__spawn(unit_type, x, y, 0)
+        for unit_type, x, y in enemy_deploys or []:
+            self.__spawn(unit_type, x, y, 1)
+
+    def __spawn(self, unit_type, x, y, player_index):
+        unit = GameUnit(unit_type, self.config, player_index, None, x, y)
+        target_edge = self.game_state.get_target_edge([x, y])
+        edge_locations = EDGE_SETS[target_edge]
+        mover = _Mover(unit, target_edge, edge_locations, max(1, round(1 / unit.speed)))
+        mover.path = self.game_state.find_path_to_edge([x, y], target_edge)
+        self.game_map._place_unit(unit)
+        self.movers.append(mover)
+
+    def run(self, max_frames=1000):
+        """Plays frames until no information units are left
+
+        Args:
+            * max_frames: The most frames to play before giving up
+
+        Returns:
+            A SimulationResult describing the action phase
+
+        """
+        result = SimulationResult(self.game_state)
+        shielded = set()
+        while self.movers and result.frames < max_frames:
+            result.frames += 1
+            self.__shield(shielded)
+            self.__move(result)
+            self.__attack()
+            self.__remove_destroyed(result)
+        return result
+
+    def __shield(self, shielded):
+        decay = self.mechanics.get("shieldDecayPerFrame", 0)
+        for mover in self.movers:
+            unit = mover.unit
+            if unit.stability > unit.max_stability and decay:
+                self.game_map.set_stability(unit, max(unit.max_stability, unit.stability - decay))
+            for encryptor in self.firewalls:
+                if (encryptor.unit_type != self.ENCRYPTOR or encryptor.player_index != unit.player_index
+                        or encryptor.stability <= 0 or (id(encryptor), id(unit)) in shielded):
+                    continue
+                if self.game_map.distance_between_locations([encryptor.x, encryptor.y], [unit.x, unit.y]) < encryptor.range + 0.51:
+                    shielded.add((id(encryptor), id(unit)))
+                    self.game_map.set_stability(unit, unit.stability + encryptor.damage)
+
+    def __move(self, result):
+        for mover in list(self.movers):
+            mover.frames_waited += 1
+            if mover.frames_waited < mover.interval:
+                continue
+            mover.frames_waited = 0
+            unit = mover.unit
+            if unit.stability <= 0:
+                continue
+            if mover.path is None or mover.path_index + 1 >= len(mover.path):
+                self.__self_destruct(mover, result)
+                continue
+
+            mover.path_index += 1
+            x, y = mover.path[mover.path_index]
+            self.game_map._discard_unit(unit)
+            unit.x, unit.y = x, y
+            self.game_map._place_unit(unit)
+            mover.steps += 1
+
+            if (x, y) in mover.edge_locations:
+                type_config = self.config["unitInformation"][self.UNIT_TYPE_TO_INDEX[unit.unit_type]]
+                damage = type_config.get("damageToPlayer", self.mechanics.get("basePlayerHealthDamage", 1))
+                result.damage_to_player[1 - unit.player_index] += damage
+                result.breaches.append(unit)
+                self.__drop(mover)
+
+    def __self_destruct(self, mover, result):
+        unit = mover.unit
+        result.self_destructs.append(unit)
+        self.__drop(mover)
+        if mover.steps < self.mechanics.get("stepsRequiredSelfDestruct", 0):
+            return
+        for location in self.game_map.get_locations_in_range([unit.x, unit.y], self.mechanics.get("selfDestructRadius", 0)):
+            for target in self.game_map[location]:
+                if target.player_index != unit.player_index:
+                    self.game_map.set_stability(target, target.stability - unit.max_stability)
+
+    def __attack(self):
+        attackers = [firewall for firewall in self.firewalls if firewall.unit_type == self.DESTRUCTOR]
+        attackers += [mover.unit for mover in self.movers]
+        for attacker in attackers:
+            if attacker.stability <= 0:
+                continue
+            target = self.game_state.get_target(attacker)
+            if target is None:
+                continue
+            if attacker.stationary:
+                if target.stationary:
+                    continue
+                damage = attacker.damage
+            else:
+                damage = attacker.damage_f if target.stationary else attacker.damage_i
+            if damage:
+                self.game_map.set_stability(target, target.stability - damage)
+
+    def __remove_destroyed(self, result):
+        walls_fell = False
+        for firewall in list(self.firewalls):
+            if firewall.stability <= 0:
+                self.firewalls.remove(firewall)
+                self.game_map._discard_unit(firewall)
+                result.destroyed.append(firewall)
+                result.cores_destroyed[firewall.player_index] += firewall.cost
+                walls_fell = True
+        for mover in list(self.movers):
+            if mover.unit.stability <= 0:
+                self.__drop(mover)
+                result.destroyed.append(mover.unit)
+
+        if walls_fell and self.mechanics.get("rerouteMidRound", False):
+            for mover in self.movers:
+                mover.path = self.game_state.find_path_to_edge([mover.unit.x, mover.unit.y], mover.target_edge)
+                mover.path_index = 0
+
+    def __drop(self, mover):
+        self.movers.remove(mover)
+        self.game_map._discard_unit(mover.unit)
@@ -0,0 +1,61 @@
+import numpy as np
+
+from .game_map import ARENA_SIZE, range_offsets
+
+# Offsets span every pair of arena locations, so range tables built here can be indexed by any dx, dy
+REACH = ARENA_SIZE - 1
+
+
+def range_table(radii):
+    """Builds a lookup of the offsets get_locations_in_range covers for each radius
+
+    Args:
+        * radii: A list of radii
+
+    Returns:
+        A boolean array of shape (len(radii), 2 * REACH + 1, 2 * REACH + 1) where
+        [index, dx + REACH, dy + REACH] is True if the offset is in range for radii[index]
+
+    """
+    table = np.zeros((len(radii), 2 * REACH + 1, 2 * REACH + 1), dtype=bool)
+    for index, radius in enumerate(radii):
+        for dx, dy in range_offsets(radius):
+            if abs(dx) <= REACH and abs(dy) <= REACH:
+                table[index, dx + REACH, dy + REACH] = True
+    return table
+
+
+def choose_targets(attacker, attacker_player_index, distance, stationary, stability, x, y, order):
+    """Picks the target GameState.get_target would choose for every attacker from pairs of attacker and unit in range
+
+    Every argument is an array with one entry per pair. Targets are ranked by the get_target rules,
+    mobile units first, then the nearest, the lowest stability, the lowest y for player 0 and highest y
+    for player 1, then the furthest from the middle of the board. Units tied on every rule are ranked by order.
+
+    Args:
+        * attacker: Which attacker each pair belongs to
+        * attacker_player_index: The player index of the attacker
+        * distance: The squared distance from the attacker to the unit
+        * stationary: True if the unit is a firewall
+        * stability: The stability of the unit
+        * x, y: The location of the unit
+        * order: Lower for the unit get_target would see first
+
+    Returns:
+        The index of the chosen pair for every attacker with at least one pair, in increasing attacker order
+
+    """
+    height = np.where(attacker_player_index == 0, y, -y)
+    ranked = np.lexsort((
+        order,
+        -np.abs(2 * x - REACH),
+        height,
+        stability,
+        distance,
+        stationary,
+        attacker,
+    ))
+    attacker = attacker[ranked]
+    first = np.ones(len(ranked), dtype=bool)
+    first[1:] = attacker[1:] != attacker[:-1]
+    return ranked[first]
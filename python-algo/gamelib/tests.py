@@ -1,9 +1,28 @@
 import unittest
 import json
+import math
+import pickle
+import os
+import random
+import tempfile
+import time
 from .game_state import GameState
-from .unit import GameUnit
+from .unit import GameUnit, _unit_types
+from .util import StateString, FrameView, get_turn_type
+from .navigation import ShortestPathFinder, FlatShortestPathFinder
+from .simulator import Simulator
+from .batch_simulator import BatchSimulator
+from .rollout import RolloutEvaluator
+from .think_ahead import ThinkAheadWorker
+from .transposition import TranspositionTable
+from .bit_schedule import get_bit_schedule
 from .advanced_game_state import AdvancedGameState
 
+def score_plan(config, plan, deadline):
+    if plan < 0:
+        time.sleep(1)
+    return plan * config["resources"]["bitsPerRound"]
+
 class BasicTests(unittest.TestCase):
 
     def make_turn_0_map(self, adv=False):
@@ -166,6 +185,37 @@ class BasicTests(unittest.TestCase):
         self.assertEqual([("DF", 13, 6)], game._build_stack, "Build queue is wrong!")
         self.assertEqual([("SI", 13, 0), ("SI", 13, 0), ("SI", 13, 0)], game._deploy_stack, "Deploy queue is wrong!")
 
+    def test_can_spawn_many(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        self.make_random_walls(game, 8, 80)
+        game.game_map.add_unit("SI", [13, 0], 0)
+        game.suppress_warnings(True)
+        locations = [[x, y] for x in range(-1, 29) for y in range(-1, 29)]
+        for unit_type in ["FF", "EF", "DF", "PI", "EI", "SI"]:
+            for num in [1, 2, 5]:
+                expected = [game.can_spawn(unit_type, location, num) for location in locations]
+                self.assertEqual(expected, game.can_spawn_many(unit_type, locations, num), "{} x{}".format(unit_type, num))
+        self.assertEqual([[13, 0], [12, 1]], game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT)[:2])
+        self.assertEqual([[14, 27], [15, 26]], game.game_map.get_edges()[0][:2])
+
+    def test_bulk_spawning(self, adv=False):
+        rng = random.Random(5)
+        for unit_type in ["FF", "EF", "DF", "PI", "EI", "SI"]:
+            game = self.make_turn_0_map(adv)
+            self.make_random_walls(game, 9, 40)
+            game._player_resources[0] = {'cores': 13.7, 'bits': 9.3}
+            locations = [[rng.randint(0, 27), rng.randint(0, 15)] for _ in range(40)] + [[13, 0], [13, 0], [14, 0]]
+            one_at_a_time = game.fork()
+            expected = 0
+            for location in locations:
+                for _ in range(3):
+                    if one_at_a_time.can_spawn(unit_type, location):
+                        expected += one_at_a_time.attempt_spawn(unit_type, location)
+            self.assertEqual(expected, game.attempt_spawn(unit_type, locations, 3), unit_type)
+            self.assertEqual(self.board_summary(one_at_a_time), self.board_summary(game), unit_type)
+            self.assertEqual(one_at_a_time._build_stack, game._build_stack)
+            self.assertEqual(one_at_a_time._deploy_stack, game._deploy_stack)
+
     def test_trivial_functions(self, adv=False):
         game = self.make_turn_0_map(adv)
 
@@ -191,6 +241,19 @@ class BasicTests(unittest.TestCase):
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
         self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3)), "Wrong number of tiles in range")
 
+    def test_range_stencils(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        for radius in [0, 1, 1.5, 3, 4.5, 5]:
+            for x in range(-2, 30):
+                for y in range(-2, 30):
+                    expected = [[i, j] for i in range(max(int(x - radius), 0), min(int(x + radius + 1), 28))
+                                for j in range(max(int(y - radius), 0), min(int(y + radius + 1), 28))
+                                if game.game_map.in_arena_bounds([i, j]) and math.hypot(x - i, y - j) < radius + 0.51]
+                    self.assertEqual(expected, game.game_map.get_locations_in_range([x, y], radius))
+                    self.assertEqual(expected, [list(cell) for cell in game.game_map.cells_in_range([x, y], radius)])
+        self.assertIs(game.game_map.cells_in_range([13, 13], 3), game.game_map.cells_in_range([13, 13], 3.0))
+        self.assertEqual([[13, 13], [13, 14], [14, 13], [14, 14]], game.game_map.get_locations_in_range([13.5, 13.5], 1))
+
     def _test_get_attackers(self):
         game = self.make_turn_0_map(True)
         
@@ -207,6 +270,457 @@ class BasicTests(unittest.TestCase):
         game.game_map.add_unit("DF", [14,14], 1)
         self.assertEqual(3, len(game.get_attackers([13,13], 0)), "We should be in danger from 3 places")
 
+    def make_random_walls(self, game, seed, count=120):
+        rng = random.Random(seed)
+        locations = [location for location in game.game_map]
+        for location in rng.sample(locations, count):
+            game.game_map.add_unit("FF", location, 0 if location[1] < 14 else 1)
+        return rng
+
+    def test_flat_path_finder(self, adv=False):
+        for seed in range(3):
+            game = self.make_turn_0_map(adv)
+            self.make_random_walls(game, seed)
+            starts = game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT) + game.game_map.get_edge_locations(game.game_map.BOTTOM_RIGHT)
+            for start in starts:
+                if game.contains_stationary_unit(start):
+                    continue
+                for edge in range(4):
+                    end_points = game.game_map.get_edge_locations(edge)
+                    expected = ShortestPathFinder().navigate_multiple_endpoints(start, end_points, game)
+                    actual = FlatShortestPathFinder().navigate_multiple_endpoints(start, end_points, game)
+                    self.assertEqual(expected, actual, "Flat path finder disagrees from {} to edge {}".format(start, edge))
+
+    def test_path_cache(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        open_path = game.find_path_to_edge([13, 0])
+        self.assertEqual(open_path, game.find_path_to_edge([13, 0]), "Cached path differs from the searched one")
+        self.assertEqual((1, 1), (game.path_cache.hits, game.path_cache.misses), "Second lookup should hit the cache")
+
+        game.attempt_spawn("FF", [open_path[3]])
+        walled_path = game.find_path_to_edge([13, 0])
+        self.assertNotIn(open_path[3], walled_path, "Path cache ignored a new wall")
+        self.assertEqual(2, game.path_cache.misses, "Adding a wall should invalidate the cached path")
+
+        game.game_map.remove_unit(open_path[3])
+        self.assertEqual(open_path, game.find_path_to_edge([13, 0]), "Removing the wall should restore the old path")
+        self.assertEqual(2, game.path_cache.hits, "The path for the old layout should still be cached")
+
+    def test_paths_from_all_edges(self, adv=False):
+        for seed in range(3):
+            game = self.make_turn_0_map(adv)
+            self.make_random_walls(game, seed, 150)
+            for target_edge in [None, game.game_map.TOP_LEFT, game.game_map.BOTTOM_RIGHT]:
+                paths = game.find_paths_from_all_edges(target_edge)
+                game.path_cache.clear()
+                for location in game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT) + game.game_map.get_edge_locations(game.game_map.BOTTOM_RIGHT):
+                    expected = game.find_path_to_edge(location, target_edge)
+                    self.assertEqual(expected, paths.get(tuple(location)), "Batched path from {} differs".format(location))
+                    game.path_cache.clear()
+
+    def test_incremental_path_repair(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        rng = self.make_random_walls(game, 7, 80)
+        finder = game._shortest_path_finder
+        locations = [location for location in game.game_map]
+        starts = game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT) + game.game_map.get_edge_locations(game.game_map.BOTTOM_RIGHT)
+        for step in range(60):
+            location = rng.choice(locations)
+            if game.contains_stationary_unit(location):
+                game.game_map.remove_unit(location)
+            else:
+                game.game_map.add_unit("FF", location, 0 if location[1] < 14 else 1)
+            start = rng.choice(starts)
+            if game.contains_stationary_unit(start):
+                continue
+            for edge in range(4):
+                end_points = game.game_map.get_edge_locations(edge)
+                expected = ShortestPathFinder().navigate_multiple_endpoints(start, end_points, game)
+                self.assertEqual(expected, finder.navigate_multiple_endpoints(start, end_points, game), "Repaired path differs after step {}".format(step))
+            for field, seeds in finder._fields.values():
+                self.assertEqual(finder._search_field(tuple(seeds)), field, "Repaired pathlengths differ after step {}".format(step))
+
+    def test_occupancy_grid(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        rng = self.make_random_walls(game, 11, 60)
+        locations = [location for location in game.game_map]
+        for _ in range(80):
+            location = rng.choice(locations)
+            if rng.random() < 0.3:
+                game.game_map.remove_unit(location)
+            else:
+                game.game_map.add_unit(rng.choice(["FF", "EF", "DF", "PI", "EI", "SI"]), location, rng.randint(0, 1))
+
+        grid = game.game_map.occupancy
+        for x, y in locations:
+            units = game.game_map[x, y]
+            self.assertEqual(bool(game.contains_stationary_unit([x, y])), grid.blocked[x, y], "Blocked mask is out of date")
+            for player_index in range(2):
+                for unit_type, type_index in grid.type_index.items():
+                    matching = [unit for unit in units if unit.player_index == player_index and unit.unit_type == unit_type]
+                    self.assertEqual(len(matching), grid.counts[player_index, type_index, x, y], "Counts are out of date")
+                    self.assertAlmostEqual(sum(unit.stability for unit in matching), grid.stability[player_index, type_index, x, y])
+        destructors = [location for location in locations if any(unit.unit_type == "DF" and unit.player_index == 1 for unit in game.game_map[location])]
+        self.assertEqual(sorted(destructors), grid.locations(1, "DF"), "Enemy destructor query is wrong")
+
+    def test_unit_index(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        rng = self.make_random_walls(game, 12, 40)
+        locations = [location for location in game.game_map]
+        for _ in range(30):
+            game.game_map.add_unit("DF", rng.choice(locations), rng.randint(0, 1))
+        game.game_map.add_unit("PI", [13, 0], 0)
+        game.game_map.add_unit("PI", [13, 0], 0)
+
+        def check(state):
+            for player_index in range(2):
+                for unit_type in ["FF", "EF", "DF", "PI", "EI", "SI"]:
+                    expected = {}
+                    for x, y in locations:
+                        count = sum(1 for unit in state.game_map[x, y] if unit.player_index == player_index and unit.unit_type == unit_type)
+                        if count:
+                            expected[x, y] = count
+                    self.assertEqual(expected, state.game_map.occupancy.unit_locations(player_index, unit_type))
+                    self.assertEqual(sorted([x, y] for x, y in expected), state.game_map.get_unit_locations(player_index, unit_type))
+                    self.assertEqual(sum(expected.values()), state.game_map.occupancy.count(player_index, unit_type))
+            for x, y in locations:
+                expected = [unit for location in state.game_map.get_locations_in_range([x, y], 3)
+                            for unit in state.game_map[location] if unit.unit_type == "DF" and unit.player_index == 1]
+                self.assertEqual(expected, state.get_attackers([x, y], 0))
+
+        child = game.fork()
+        with child.transaction():
+            child.game_map.remove_unit(game.game_map.get_unit_locations(1, "DF")[0])
+            child.game_map.add_unit("EF", [12, 12], 1)
+            check(child)
+        child.game_map.remove_unit([13, 0])
+        check(child)
+        check(game)
+        self.assertEqual(2, game.game_map.occupancy.unit_locations(0, "PI")[13, 0])
+
+    def test_damage_map(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        rng = random.Random(5)
+        locations = [location for location in game.game_map]
+        for location in rng.sample(locations, 40):
+            game.game_map.add_unit(rng.choice(["DF", "DF", "FF"]), location, rng.randint(0, 1))
+        for player_index in range(2):
+            damage = game.damage_map(player_index)
+            for x, y in locations:
+                expected = len(game.get_attackers([x, y], player_index)) * GameUnit("DF", game.config).damage
+                self.assertEqual(expected, damage[x, y], "Wrong damage at {} for player {}".format([x, y], player_index))
+        self.assertIs(damage, game.damage_map(1), "Damage map should be reused while destructors are unchanged")
+        game.game_map.add_unit("DF", [13, 13], 0)
+        self.assertEqual(damage[13, 13] + 4, game.damage_map(1)[13, 13], "Damage map ignored a new destructor")
+
+    def test_get_targets(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        rng = self.make_random_walls(game, 13, 90)
+        locations = [location for location in game.game_map]
+        for _ in range(60):
+            game.game_map.add_unit(rng.choice(["PI", "EI", "SI", "DF"]), rng.choice(locations), rng.randint(0, 1))
+        for location in rng.sample(locations, 150):
+            for unit in game.game_map[location]:
+                # Few distinct values so targets often tie on stability
+                game.game_map.set_stability(unit, rng.choice([5.0, 10.0, 15.0]))
+
+        units = [unit for location in game.game_map for unit in game.game_map[location]]
+        expected = [game.get_target(unit) for unit in units]
+        targets = game.get_targets(units + ["not a unit"])
+        self.assertEqual(len(units) + 1, len(targets))
+        self.assertIsNone(targets[-1])
+        for unit, expected_target, target in zip(units, expected, targets):
+            self.assertIs(expected_target, target, "Wrong target for {}".format(unit))
+        self.assertTrue(any(target is not None for target in targets))
+
+    def test_simulator(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game._player_resources[0]['bits'] = 10
+        game.attempt_spawn("PI", [13, 0], 2)
+        result = Simulator(game).run()
+        self.assertEqual(2, len(result.breaches), "Pings on an empty board should breach")
+        self.assertEqual([0, 2], result.damage_to_player)
+        self.assertEqual(0, len(result.game_state.game_map[13, 0]), "Breached units should leave the map")
+        self.assertEqual(2, len(game.game_map[13, 0]), "Simulating should not change the game state")
+
+        for x in range(12, 16):
+            game.game_map.add_unit("DF", [x, 3], 1)
+            game.game_map.add_unit("DF", [x, 24], 0)
+        result = Simulator(game, [("SI", 14, 27)]).run()
+        self.assertEqual(0, len(result.breaches), "Units should not get past a row of destructors")
+        self.assertEqual(3, len(result.destroyed), "The pings and the scrambler should be destroyed")
+        self.assertEqual(4, len(game.game_map.occupancy.locations(1, "DF")), "Simulating should not change the game state")
+
+        counts = game.game_map.occupancy.counts
+        Simulator(game)
+        game.game_map.add_unit("FF", [13, 5], 0)
+        self.assertIs(counts, game.game_map.occupancy.counts, "Simulating should not leave the map copying on every change")
+
+    def test_batch_simulator(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        for x in range(12, 16):
+            game.game_map.add_unit("DF", [x, 24], 0)
+        deployments = [[("PI", 13, 0), ("PI", 13, 0)], [], [("EI", 14, 0)]]
+        result = BatchSimulator(game, deployments, [("SI", 14, 27)]).run()
+        for row, deploys in enumerate(deployments):
+            game._deploy_stack = deploys
+            expected = Simulator(game, [("SI", 14, 27)]).run()
+            self.assertEqual(expected.damage_to_player, list(result.damage_to_player[row]), "Candidate {} differs from Simulator".format(row))
+            self.assertEqual(len(expected.breaches), result.breaches[row].sum())
+            self.assertEqual(expected.frames, result.frames[row])
+
+    def test_rollout_evaluator(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        evaluator = RolloutEvaluator(game.config, score_plan, workers=2)
+        evaluator.warm_up()
+        try:
+            self.assertEqual([(15.0, 3), (5.0, 1), (0.0, 0)], evaluator.evaluate([1, 0, 3]))
+            started = time.time()
+            self.assertIsNone(evaluator.best([-1, -1, 2], started + 0.3), "Plans still running at the deadline should be dropped")
+            self.assertLess(time.time() - started, 0.9, "Evaluate should return at the deadline")
+            self.assertEqual([(10.0, 2), (5.0, 1)], evaluator.evaluate([1, 2], time.time() + 0.5),
+                             "Plans left running by the last call should not hold up the next one")
+        finally:
+            evaluator.shutdown()
+
+    def test_state_string(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        message = StateString(game.serialized_string.replace('"turnInfo":[0,0,-1]', '"turnInfo":[0,3,-1]'))
+        self.assertEqual(0, get_turn_type(message))
+        self.assertIs(message.state, message.state, "The message should only be parsed once")
+        self.assertEqual(3, GameState(game.config, message).turn_number)
+        self.assertEqual(1, get_turn_type(StateString('{"turnInfo": [ 1, 3, 12], "p1Stats": []}')))
+        self.assertEqual(2, get_turn_type('{"p1Stats": [], "turnInfo" :[2,3,-1]}'))
+
+    def test_frame_view(self, adv=False):
+        message = '{"p1Units":[[],[],[[3,11,75.0,"7"]],[],[],[],[]],"turnInfo":[1,3,12],"p1Stats":[30.0,25.0,5.0,0],' \
+            '"events":{"selfDestruct":[],"breach":[[[13,27],1.0,3,"9",2]],"damage":[]}}'
+        frame = FrameView(message, ("events.breach", "p1Stats", "p1Units"))
+        self.assertEqual([[[13, 27], 1.0, 3, "9", 2]], frame["events.breach"])
+        self.assertEqual([3, 11, 75.0, "7"], frame["p1Units"][2][0])
+        self.assertEqual(json.loads(message)["p1Stats"], frame["p1Stats"])
+        with self.assertRaises(KeyError):
+            frame["events"]
+        spaced = FrameView(message.replace('"breach":', '"breach" :'), ("events.breach",))
+        self.assertEqual(frame["events.breach"], spaced["events.breach"])
+
+    def test_think_ahead(self, adv=False):
+        plans = []
+        def plan(frame):
+            plans.append(frame["walls"])
+            time.sleep(0.05)
+            return frame["walls"] * 2
+        worker = ThinkAheadWorker(plan, lambda state: state["walls"])
+        worker.start()
+        try:
+            worker.submit({"walls": 3})
+            self.assertEqual(6, worker.take({"walls": 3}, timeout=1))
+            self.assertIsNone(worker.take({"walls": 3}), "A plan should only be handed over once")
+
+            worker.submit({"walls": 4})
+            time.sleep(0.2)
+            worker.submit({"walls": 4})
+            self.assertIsNone(worker.take({"walls": 5}, timeout=0.2), "A plan for another board should be dropped")
+            self.assertEqual([3, 4], plans, "Frames with an unchanged key should not be planned again")
+        finally:
+            worker.stop()
+
+    def board_summary(self, game):
+        units = []
+        for location in game.game_map:
+            for unit in game.game_map[location]:
+                units.append((unit.unit_type, unit.player_index, unit.x, unit.y, unit.stability, unit.pending_removal, unit.unit_id))
+        return sorted(units), game.turn_number, [dict(resources) for resources in game._player_resources], game.game_map.get_wall_mask()
+
+    def test_apply_frame(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        state = json.loads(game.serialized_string)
+        state["p1Units"] = [[[3, 11, 60.0, "1"], [4, 11, 60.0, "2"]], [], [[13, 12, 75.0, "3"]], [], [], [], []]
+        state["p2Units"] = [[], [], [[13, 16, 75.0, "4"]], [[14, 20, 15.0, "5"]], [], [], []]
+        first = GameState(game.config, json.dumps(state))
+        first.attempt_spawn("FF", [5, 11])
+
+        state["turnInfo"] = [0, 1, -1]
+        state["p1Stats"] = [28.0, 10.0, 7.0, 0]
+        state["p1Units"] = [[[3, 11, 30.0, "1"], [6, 11, 60.0, "6"]], [], [[13, 12, 75.0, "3"]], [], [], [], [[13, 12, 75.0, "7"]]]
+        state["p2Units"] = [[], [], [[13, 16, 75.0, "4"]], [[14, 19, 15.0, "5"]], [], [], []]
+        updated = first.next_turn(json.dumps(state))
+        self.assertIs(first, updated)
+        self.assertEqual(self.board_summary(GameState(game.config, json.dumps(state))), self.board_summary(updated))
+        self.assertEqual([], updated._build_stack)
+        self.assertEqual(2, len(updated.game_map.occupancy.locations(0, "FF")), "The occupancy grid should follow the frame")
+
+        # Units removed from the map by hand should be put back by the next frame, whether or not they changed
+        updated.game_map.remove_unit([13, 16])
+        updated.game_map[14, 19] = []
+        updated.next_turn(json.dumps(state))
+        self.assertEqual(self.board_summary(GameState(game.config, json.dumps(state))), self.board_summary(updated))
+        updated.game_map.remove_unit([13, 16])
+        state["p2Units"] = [[], [], [[13, 16, 40.0, "4"]], [[14, 19, 15.0, "5"]], [], [], []]
+        updated.next_turn(json.dumps(state))
+        self.assertEqual(self.board_summary(GameState(game.config, json.dumps(state))), self.board_summary(updated))
+
+    def test_unit_types_are_shared(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        first = GameUnit("PI", game.config, 0, None, 13, 0)
+        second = GameUnit("PI", game.config, 1, 3.0, 14, 27)
+        self.assertIs(first._type, second._type, "Units of one type should share their stats")
+        self.assertFalse(hasattr(first, "__dict__"), "GameUnit should only hold its slots")
+        self.assertEqual((15.0, 3.0, 0.5), (first.stability, second.stability, second.speed))
+        self.assertFalse(hasattr(first, "damage"), "Information units have no firewall damage")
+        self.assertFalse(hasattr(GameUnit("DF", game.config), "damage_i"), "Firewalls have no information damage")
+        self.assertEqual(10.0, GameUnit("EF", game.config).damage, "Encryptor damage is its shield amount")
+        with self.assertRaises(AttributeError):
+            first._type.cost = 0
+        copied = pickle.loads(pickle.dumps(second))
+        self.assertEqual((1, 3.0, 14, 27, 1.0), (copied.player_index, copied.stability, copied.x, copied.y, copied.cost))
+        cached = len(_unit_types)
+        for _ in range(100):
+            copied = pickle.loads(pickle.dumps(copied))
+        self.assertIs(second._type, copied._type, "Unpickled units should share the stats of units with an equal config")
+        self.assertEqual(cached, len(_unit_types), "Unpickled configs should not each add to the cache")
+
+    def test_fork(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        self.make_random_walls(game, 4, 60)
+        game.game_map.add_unit("PI", [13, 0], 0)
+        before = self.board_summary(game)
+        counts = game.game_map.occupancy.counts.copy()
+        path = game.find_path_to_edge([13, 0])
+
+        child = game.fork()
+        self.assertEqual(before, self.board_summary(child))
+        child.attempt_spawn("DF", [14, 1])
+        child.game_map.remove_unit([0, 13])
+        unit = child.game_map[13, 0][0]
+        child.game_map.set_stability(unit, 1.0)
+        self.assertEqual(before, self.board_summary(game), "Changing a fork should not change its parent")
+        self.assertTrue((counts == game.game_map.occupancy.counts).all())
+        self.assertEqual([], game._build_stack)
+        self.assertEqual(path, game.find_path_to_edge([13, 0]))
+        self.assertEqual(1.0, child.game_map[13, 0][0].stability)
+        self.assertIn([14, 1], path)
+        self.assertNotIn([14, 1], child.find_path_to_edge([13, 0]), "The fork should path around its new destructor")
+
+        forked = self.board_summary(child)
+        game.game_map.remove_unit([13, 0])
+        game.game_map.add_unit("FF", [13, 2], 0)
+        self.assertEqual(forked, self.board_summary(child), "Changing a parent should not change its fork")
+        self.assertTrue(child.contains_stationary_unit([14, 1]) and not child.contains_stationary_unit([13, 2]))
+
+    def test_fork_own_caches(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        self.make_random_walls(game, 4, 60)
+        path = game.find_path_to_edge([13, 0])
+
+        shared = game.fork()
+        self.assertIs(game.path_cache, shared.path_cache)
+        self.assertIs(game._shortest_path_finder, shared._shortest_path_finder)
+
+        child = game.fork(share_caches=False)
+        self.assertIsNot(game.path_cache, child.path_cache)
+        self.assertIsNot(game._shortest_path_finder, child._shortest_path_finder)
+        self.assertIsNot(game.transposition_table, child.transposition_table)
+        self.assertEqual(0, len(child.path_cache))
+        self.assertEqual(path, child.find_path_to_edge([13, 0]))
+        self.assertEqual(1, len(child.path_cache), "Paths found by the fork should go in its own cache")
+        self.assertEqual(1, len(game.path_cache))
+
+    def test_transaction(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        self.make_random_walls(game, 6, 60)
+        game.game_map.add_unit("PI", [13, 0], 0)
+        before = self.board_summary(game)
+        counts = game.game_map.occupancy.counts.copy()
+
+        with game.transaction():
+            game.attempt_spawn("DF", [13, 2])
+            game.attempt_spawn("PI", [13, 0], 2)
+            game.game_map.set_stability(game.game_map[13, 0][0], 2.0)
+            game.game_map.remove_unit([0, 13])
+            outer = self.board_summary(game)
+            with game.transaction():
+                game.attempt_spawn("FF", [12, 2])
+                game.game_map.remove_unit([13, 2])
+                self.assertFalse(game.contains_stationary_unit([13, 2]))
+            self.assertEqual(outer, self.board_summary(game), "The inner transaction should only undo its own changes")
+            self.assertEqual(1, len(game._build_stack))
+        self.assertEqual(before, self.board_summary(game), "The transaction should undo every change")
+        self.assertTrue((counts == game.game_map.occupancy.counts).all())
+        self.assertEqual(([], []), (game._build_stack, game._deploy_stack))
+        self.assertEqual(25.0, game.get_resource(game.CORES))
+
+    def test_board_hash(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        empty = game.board_hash()
+        self.make_random_walls(game, 8, 40)
+        game.game_map.add_unit("PI", [13, 0], 0)
+        game.game_map.add_unit("PI", [13, 0], 0)
+        same = self.make_turn_0_map(adv)
+        locations = [location for location in game.game_map if game.game_map[location]]
+        for location in reversed(locations):
+            for unit in game.game_map[location]:
+                same.game_map.add_unit(unit.unit_type, location, unit.player_index)
+        self.assertEqual(game.board_hash(), same.board_hash(), "The hash should not depend on the order units were added")
+        self.assertEqual(game.game_map.get_stability_hash(), same.game_map.get_stability_hash())
+        self.assertNotEqual(empty, game.board_hash())
+
+        full = game.board_hash()
+        stability = game.game_map.get_stability_hash()
+        with game.transaction():
+            game.game_map.remove_unit([13, 0])
+            game.game_map.add_unit("PI", [13, 0], 0)
+            self.assertNotEqual(full, game.board_hash(), "Stacked units should each count")
+            unit = game.game_map[locations[0]][0]
+            game.game_map.set_stability(unit, 1.0)
+            game.game_map.set_pending_removal(unit, True)
+            self.assertNotEqual(stability, game.game_map.get_stability_hash())
+            game.game_map.set_pending_removal(unit, False)
+            game.game_map.set_stability(unit, float(unit.max_stability))
+            game.game_map.add_unit("PI", [13, 0], 0)
+            self.assertEqual(stability, game.game_map.get_stability_hash(), "Undoing changes should restore the hash")
+        self.assertEqual(full, game.board_hash())
+        self.assertEqual(stability, game.game_map.get_stability_hash())
+        for location in locations:
+            game.game_map.remove_unit(location)
+        self.assertEqual(empty, game.board_hash())
+
+    def test_transposition_table(self, adv=False):
+        table = TranspositionTable(max_bytes=300)
+        table.put("a", 1)
+        table.put("b", [0] * 100)
+        self.assertEqual(1, table.get("a"))
+        table.put("c", [1] * 100)
+        self.assertEqual((1, None), (table.get("a"), table.get("b")), "The least recently used result should be evicted")
+        table.put("d", [2] * 1000)
+        self.assertNotIn("d", table, "Results bigger than the table should not be stored")
+        self.assertLessEqual(table.size, table.max_bytes)
+
+        path = os.path.join(tempfile.mkdtemp(), "table.pickle")
+        table.save(path)
+        loaded = TranspositionTable(path=path)
+        self.assertEqual(([1] * 100, 1), (loaded.get("c"), loaded.get("a")))
+
+        game = self.make_turn_0_map(adv)
+        game._player_resources[0]['bits'] = 10
+        game.attempt_spawn("PI", [13, 0], 2)
+        first = game.simulate()
+        with game.transaction():
+            game._deploy_stack.reverse()
+            self.assertEqual(first, game.simulate(), "Deploys in another order should reuse the result")
+            self.assertEqual(1, game.transposition_table.hits)
+            game.game_map.set_stability(game.game_map[13, 0][0], 1.0)
+            game.simulate()
+            self.assertEqual(2, game.transposition_table.misses, "Damaged units should not reuse the result")
+            first, second = game.game_map[13, 0]
+            game.game_map.set_stability(first, 15.0)
+            game.game_map.set_stability(second, 5.0)
+            game.simulate()
+            game.game_map.set_stability(first, 10.0)
+            game.game_map.set_stability(second, 10.0)
+            game.simulate()
+            self.assertEqual(4, game.transposition_table.misses, "Stacks with the same total stability should not share a result")
+
     def test_print_unit(self, adv=False):
         game = self.make_turn_0_map(adv)
 
@@ -239,6 +753,29 @@ class BasicTests(unittest.TestCase):
         self.future_turn_testing_function(game, 17.9, 19)
         self.future_turn_testing_function(game, 18.9, 20)
 
+    def test_bit_schedule(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        resources = game.config["resources"]
+        schedule = get_bit_schedule(game.config)
+        self.assertIs(schedule, get_bit_schedule(game.config))
+        self.assertIs(schedule, get_bit_schedule(json.loads(json.dumps(game.config))), "Equal configs should share a schedule")
+
+        rng = random.Random(14)
+        starts = [round(rng.uniform(0, 60), rng.randint(0, 3)) for _ in range(200)] + [index / 20 for index in range(400)]
+        for turn_number in [0, 9, 35]:
+            game.turn_number = turn_number
+            for turns in [1, 4, 23, 99]:
+                projected = schedule.project_many(starts, turn_number, turns)
+                for bits, vector_bits in zip(starts, projected):
+                    expected = bits
+                    for increment in range(1, turns + 1):
+                        expected *= (1 - resources["bitDecayPerRound"])
+                        expected += resources["bitsPerRound"] + (resources["bitGrowthRate"] * ((turn_number + increment) // resources["turnIntervalForBitSchedule"]))
+                        expected = round(expected, 1)
+                    self.assertEqual(expected, game.project_future_bits(turns, 0, bits) if bits else schedule.project(bits, turn_number, turns))
+                    self.assertEqual(expected, vector_bits)
+        self.assertEqual(7.5, game.project_future_bits(0, 0, 7.5), "Projecting no turns ahead should keep the bits")
+
     def future_turn_testing_function(self, game, expected, turns):
         actual = game.project_future_bits(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} power {} turns from now, got {}".format(expected, turns, actual))
@@ -0,0 +1,103 @@
+import threading
+import time
+
+from .util import debug_write
+
+
+class ThinkAheadWorker:
+    """Runs speculative planning on a background thread while the action phase plays out.
+
+    Frames are handed over with submit. The thread plans on the newest frame it has not seen,
+    skipping frames that arrived while it was busy, and only plans again once the key of the
+    frames changes. take then returns the result if its key matches the state of the new turn.
+
+    Args:
+        * plan: Called as plan(frame) on the background thread, returns the result to hand over
+        * key: Called as key(state) on a frame or a turn state, returns a hashable summary of
+          everything plan depends on
+
+    """
+    def __init__(self, plan, key):
+        self.__plan = plan
+        self.__key = key
+        self.__condition = threading.Condition()
+        self.__frame = None
+        self.__planning_key = None
+        self.__busy = False
+        self.__result = None
+        self.__stopped = False
+        self.__thread = threading.Thread(target=self.__run, name="think-ahead", daemon=True)
+
+    def start(self):
+        self.__thread.start()
+
+    def stop(self):
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify_all()
+
+    def submit(self, frame):
+        """Hands the newest action frame to the background thread
+        """
+        with self.__condition:
+            self.__frame = frame
+            self.__condition.notify_all()
+
+    def take(self, state, timeout=0):
+        """Gets the result planned for a turn state and forgets it
+
+        Args:
+            * state: The state of the new turn
+            * timeout: Seconds to wait if the background thread is still planning for this state
+
+        Returns:
+            The result of plan, or None if nothing was planned for this state
+
+        """
+        key = self.__key(state)
+        deadline = time.time() + timeout
+        with self.__condition:
+            # Wait while a frame is waiting or being planned on, unless it is known to be for another board
+            while ((self.__frame is not None or self.__busy) and self.__planning_key in (None, key)
+                   and time.time() < deadline):
+                self.__condition.wait(deadline - time.time())
+            # Frames left over from the last action phase are no longer worth planning on
+            self.__frame = None
+            result = self.__result
+            self.__result = None
+        if result is None or result[0] != key:
+            return None
+        return result[1]
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while self.__frame is None and not self.__stopped:
+                    self.__condition.wait()
+                if self.__stopped:
+                    return
+                frame = self.__frame
+                self.__frame = None
+                self.__busy = True
+                planned = self.__result
+
+            key, result = None, None
+            try:
+                key = self.__key(frame)
+                if planned is not None and planned[0] == key:
+                    # Already planned for this board
+                    key = None
+                else:
+                    with self.__condition:
+                        self.__planning_key = key
+                    result = self.__plan(frame)
+            except Exception as error:
+                debug_write("Planning ahead failed: {}".format(error))
+                key = None
+
+            with self.__condition:
+                self.__busy = False
+                self.__planning_key = None
+                if key is not None:
+                    self.__result = (key, result)
+                self.__condition.notify_all()
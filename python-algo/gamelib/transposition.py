@@ -0,0 +1,127 @@
+import os
+import pickle
+from collections import OrderedDict
+
+from .util import debug_write
+
+
+def deployment_key(deploys):
+    """Gets a key for a list of deploys that does not depend on their order
+
+    Args:
+        * deploys: A list of (unit_type, x, y)
+
+    Returns:
+        A sorted tuple of (unit_type, x, y) tuples, so the same multiset of deploys always gives the same key
+
+    """
+    return tuple(sorted((unit_type, int(x), int(y)) for unit_type, x, y in deploys))
+
+
+class TranspositionTable:
+    """A bounded cache of evaluation results that evicts the least recently used results when it is over its size
+
+    The size of a result is the length of its pickle, so a few large results take the room of many small ones.
+    The table can be saved to disk and loaded again, for example to keep results between games against the same opponent.
+
+    Attributes:
+        * max_bytes (int): The pickled size of the results the table holds before it starts evicting
+        * size (int): The pickled size of the results held now
+        * hits (int): The number of lookups that found a stored result
+        * misses (int): The number of lookups that did not
+
+    """
+    def __init__(self, max_bytes=16 * 1024 * 1024, path=None):
+        """Creates an empty table, or loads one saved at path if the file exists
+
+        Args:
+            * max_bytes: The pickled size of the results to hold
+            * path: A file saved with save to load the results from
+
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def get(self, key):
+        """Gets a stored result
+
+        Args:
+            * key: The key the result was stored under
+
+        Returns:
+            The stored result, or None if there is no result stored under key
+
+        """
+        entry = self.__entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value):
+        """Stores a result, evicting the least recently used results until the table fits in max_bytes
+
+        Args:
+            * key: A picklable key to store the result under
+            * value: The picklable result to store. Results bigger than max_bytes on their own are not stored.
+
+        """
+        size = len(pickle.dumps((key, value), pickle.HIGHEST_PROTOCOL))
+        if key in self.__entries:
+            self.size -= self.__entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self.__entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self.__entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def clear(self):
+        """Removes every result and resets the hit and miss counters
+        """
+        self.__entries.clear()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def save(self, path):
+        """Writes every result to a file, replacing it in one step so a crash never leaves half a file
+
+        Args:
+            * path: The file to write
+
+        """
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            pickle.dump([(key, entry[0]) for key, entry in self.__entries.items()], file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    def load(self, path):
+        """Adds the results saved in a file, oldest first, so the most recently used stay when the table is full
+
+        Args:
+            * path: A file written by save
+
+        """
+        try:
+            with open(path, "rb") as file:
+                entries = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError) as error:
+            debug_write("Could not load transposition table from {}: {}".format(path, error))
+            return
+        for key, value in entries:
+            self.put(key, value)
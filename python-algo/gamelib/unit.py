@@ -1,6 +1,93 @@
+from .util import ConfigCache
+
+
 def is_stationary(unit_type, firewall_types):
     return unit_type in firewall_types
 
+# The number of firewall types, which come first in config["unitInformation"]
+FIREWALL_TYPE_COUNT = 3
+
+# The UnitTypes built for each config, by shorthand
+_unit_types = ConfigCache(lambda config: {})
+
+
+class UnitType:
+    """The stats shared by every unit of one type. Instances are immutable and shared between units.
+
+    Attributes:
+        * unit_type (string): The type's shorthand
+        * config (JSON): The config the stats were read from
+        * stationary (bool): Whether or not this type is a firewall
+        * speed (float): A unit will move once every 1/speed frames
+        * damage (int): The damage, or shield amount for encryptors, of a firewall type. Missing for information types.
+        * damage_f (int): The damage an information type deals to firewalls. Missing for firewall types.
+        * damage_i (int): The damage an information type deals to information. Missing for firewall types.
+        * range (float): The effective range of this type
+        * max_stability (float): The starting stability of this type
+        * cost (int): The resource cost of this type
+
+    """
+    __slots__ = ("unit_type", "config", "stationary", "speed", "damage", "damage_f", "damage_i", "range", "max_stability", "cost")
+
+    def __init__(self, unit_type, config):
+        unit_information = config["unitInformation"]
+        shorthands = [type_config.get("shorthand") for type_config in unit_information]
+        index = shorthands.index(unit_type) if unit_type in shorthands else None
+        if index is None:
+            raise KeyError(unit_type)
+        type_config = unit_information[index]
+        stationary = is_stationary(unit_type, shorthands[:FIREWALL_TYPE_COUNT])
+
+        stats = {"unit_type": unit_type, "config": config, "stationary": stationary}
+        if stationary:
+            stats["speed"] = 0
+            # Encryptors are the second firewall type and "damage" their friends with shields
+            if index == 1:
+                stats["damage"] = type_config["shieldAmount"]
+            else:
+                stats["damage"] = type_config["damage"]
+        else:
+            stats["speed"] = type_config["speed"]
+            stats["damage_f"] = type_config["damageF"]
+            stats["damage_i"] = type_config["damageI"]
+        stats["range"] = type_config["range"]
+        stats["max_stability"] = type_config["stability"]
+        stats["cost"] = type_config["cost"]
+        for name, value in stats.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UnitType is immutable, can not set {}".format(name))
+
+    def __delattr__(self, name):
+        raise AttributeError("UnitType is immutable, can not delete {}".format(name))
+
+    def __reduce__(self):
+        return get_unit_type, (self.unit_type, self.config)
+
+
+def get_unit_type(unit_type, config):
+    """Gets the shared UnitType for a unit type, building it the first time it is asked for with an equal config
+
+    Args:
+        * unit_type: The type's shorthand
+        * config (JSON): Contains information about the game
+
+    Returns:
+        The UnitType holding the type's stats
+
+    """
+    types = _unit_types.get(config)
+    if unit_type not in types:
+        types[unit_type] = UnitType(unit_type, config)
+    return types[unit_type]
+
+
+def _type_stat(name):
+    def get(self):
+        return getattr(self._type, name)
+    return property(get, doc="This unit's {}, shared by every unit of its type".format(name))
+
 class GameUnit:
     """Holds information about a Unit. 
 
@@ -19,39 +106,37 @@ class GameUnit:
         * max_stability (float): The starting stability of this unit. Note than stability can be increased beyond this value by encryptors
         * stability (float): The current health of this unit
         * cost (int): The resource cost of this unit
+        * unit_id (string): The id the game gave this unit, or None for units made by the algo
+
+    The per type stats are read from a UnitType shared by every unit of the type.
+    Only the fields that change from unit to unit are stored on each unit.
 
     """
-    def __init__(self, unit_type, config, player_index=None, stability=None, x=-1, y=-1):
+    __slots__ = ("unit_type", "_type", "player_index", "pending_removal", "unit_id", "x", "y", "stability")
+
+    config = _type_stat("config")
+    stationary = _type_stat("stationary")
+    speed = _type_stat("speed")
+    damage = _type_stat("damage")
+    damage_f = _type_stat("damage_f")
+    damage_i = _type_stat("damage_i")
+    range = _type_stat("range")
+    max_stability = _type_stat("max_stability")
+    cost = _type_stat("cost")
+
+    def __init__(self, unit_type, config, player_index=None, stability=None, x=-1, y=-1, unit_id=None):
         """ Initialize unit variables using args passed
 
         """
         self.unit_type = unit_type
-        self.config = config
+        self._type = get_unit_type(unit_type, config)
         self.player_index = player_index
         self.pending_removal = False
+        self.unit_id = unit_id
         self.x = x
         self.y = y
-        self.__serialize_type()
         self.stability = self.max_stability if not stability else stability
 
-    def __serialize_type(self):
-        from .game_state import FIREWALL_TYPES, UNIT_TYPE_TO_INDEX, ENCRYPTOR
-        self.stationary = is_stationary(self.unit_type, FIREWALL_TYPES)
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        if self.stationary:
-            self.speed = 0
-            if self.unit_type == ENCRYPTOR:
-                self.damage = type_config["shieldAmount"]
-            else:
-                self.damage = type_config["damage"]
-        else:
-            self.speed = type_config["speed"]
-            self.damage_f = type_config["damageF"]
-            self.damage_i = type_config["damageI"]
-        self.range = type_config["range"]
-        self.max_stability = type_config["stability"]
-        self.cost = type_config["cost"]
-
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
         removal = ", pending removal" if self.pending_removal else ""
@@ -1,8 +1,150 @@
+import json
+import re
 import sys
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
+TURN_INFO_PATTERN = re.compile(r'"turnInfo"\s*:\s*\[\s*(-?\d+)')
+
+
+class StateString(str):
+    """A game state message exactly as the game sent it, which parses its JSON at most once.
+
+    It can be used anywhere the raw string was, such as GameState(config, turn_string).
+    Reading the state attribute parses the message the first time and reuses the result after that.
+
+    Attributes:
+        * state (dict): The parsed game state
+
+    """
+    @property
+    def state(self):
+        if "_state" not in self.__dict__:
+            self.__dict__["_state"] = json.loads(self)
+        return self.__dict__["_state"]
+
+
+class FrameView:
+    """A read only view of some fields of an action frame, decoding each field only when it is first read.
+
+    Fields are dotted paths into the frame, such as "p1Stats" or "events.breach", and
+    are read with frame["events.breach"]. Reading a field that was not asked for raises a KeyError.
+
+    Attributes:
+        * raw (StateString): The whole frame as the game sent it
+        * fields (tuple): The fields this view can read
+
+    """
+    def __init__(self, message, fields):
+        self.raw = message if isinstance(message, StateString) else StateString(message)
+        self.fields = tuple(fields)
+        self.__values = {}
+
+    def __contains__(self, field):
+        return field in self.fields
+
+    def __getitem__(self, field):
+        if field not in self.fields:
+            raise KeyError("{} is not one of the fields of this frame view {}".format(field, self.fields))
+        if field not in self.__values:
+            self.__values[field] = self.__decode(field)
+        return self.__values[field]
+
+    def __decode(self, field):
+        position = 0
+        for key in field.split("."):
+            match = _key_pattern(key).search(self.raw, position)
+            if match is None:
+                break
+            position = match.end()
+        else:
+            try:
+                return _decoder.raw_decode(self.raw, position)[0]
+            except ValueError:
+                pass
+        # Unusual formatting, read the field from the fully parsed frame
+        value = self.raw.state
+        for key in field.split("."):
+            value = value[key]
+        return value
+
+
+class ConfigCache:
+    """Values built once per game config and shared by every config with the same content.
+
+    A config is looked up by identity first, so asking again with the same config object is a dict lookup.
+    A config object seen for the first time, such as one made by unpickling, is compared by its content
+    and gets the value already built for an equal config. Each lookup is cleared when it reaches limit.
+
+    Args:
+        * build: Called as build(config) to make the value for a config not seen before
+        * limit: The most config objects, and the most distinct configs, to remember
+
+    """
+    def __init__(self, build, limit=16):
+        self.__build = build
+        self.__limit = limit
+        # Keyed by id, so the config is kept alongside to stop its id being reused
+        self.__by_id = {}
+        self.__by_content = {}
+
+    def __len__(self):
+        return len(self.__by_content)
+
+    def get(self, config):
+        """Gets the value for a config, building it the first time a config with this content is seen
+
+        Args:
+            * config (JSON): A json object containing information about the game
+
+        Returns:
+            The value shared by every config equal to this one
+
+        """
+        cached = self.__by_id.get(id(config))
+        if cached is not None and cached[0] is config:
+            return cached[1]
+        content = json.dumps(config, sort_keys=True)
+        value = self.__by_content.get(content)
+        if value is None:
+            if len(self.__by_content) >= self.__limit:
+                self.__by_content.clear()
+            value = self.__build(config)
+            self.__by_content[content] = value
+        if len(self.__by_id) >= self.__limit:
+            self.__by_id.clear()
+        self.__by_id[id(config)] = (config, value)
+        return value
+
+
+_decoder = json.JSONDecoder()
+_key_patterns = {}
+
+
+def _key_pattern(key):
+    if key not in _key_patterns:
+        _key_patterns[key] = re.compile(r'"{}"\s*:\s*'.format(re.escape(key)))
+    return _key_patterns[key]
+
+
+def get_turn_type(message):
+    """Reads the message type from the turnInfo field without parsing the whole message
+
+    Args:
+        * message: A game state message
+
+    Returns:
+        0 for a turn, 1 for an action frame and 2 for the end of the game
+
+    """
+    match = TURN_INFO_PATTERN.search(message)
+    if match is None:
+        # Unusual formatting, fall back to a full parse
+        state = message.state if isinstance(message, StateString) else json.loads(message)
+        return int(state.get("turnInfo")[0])
+    return int(match.group(1))
+
 
 def get_command():
     """Gets input from stdin